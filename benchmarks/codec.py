@@ -0,0 +1,74 @@
+"""
+Message in a Bottle.
+Benchmark of the json codecs.
+
+It encodes and decodes the payloads exchanged with the microservices,
+as sent by them: the directory of the users with their base64 photos,
+a folder of messages and a single message with a photo, and measures
+the time of each codec on each payload.
+
+Usage: python -m benchmarks.codec [runs]
+"""
+import os
+import sys
+import time
+from base64 import b64encode
+
+
+def photo(size):
+    return 'data:image/jpeg;base64,' + b64encode(os.urandom(size)).decode('ascii')
+
+
+def directory(users=1000, photo_size=20000):
+    # a user out of four has a photo, the others the default one
+    return {'body': [{'id': id, 'email': 'user%d@mail.it' % id, 'first_name': 'Mario',
+                      'last_name': 'Rossi', 'birthdate': '1990-01-01T00:00:00Z',
+                      'photo': photo(photo_size) if id % 4 == 0 else '', 'points': id % 100}
+                     for id in range(1, users + 1)]}
+
+
+def message(id, photo=''):
+    return {'id': id, 'sender_id': 1, 'receiver_id': 2, 'sender': 'mario.rossi@mail.it',
+            'receiver': 'maria.bianchi@mail.it', 'body': 'Ciao Maria, è arrivato il messaggio %d?' % id,
+            'photo': photo, 'timestamp': '01/01/2030 10:00', 'draft': False, 'scheduled': True,
+            'sent': 1, 'read': id % 2, 'deleted': 0, 'bold': False, 'italic': True,
+            'underline': False}
+
+
+def folder(messages=500):
+    return {'body': [message(id) for id in range(1, messages + 1)]}
+
+
+def measure(function, argument, runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(argument)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    from mib import create_app
+    create_app()
+    from mib.rao.codec import CODECS
+
+    payloads = [
+        ('directory 1k users', directory()),
+        ('folder 500 messages', folder()),
+        ('message 200KB photo', {'body': message(1, photo(200000))}),
+    ]
+    print('%-22s %-6s %10s %12s %12s' % ('payload', 'codec', 'KB', 'decode ms', 'encode ms'))
+    for name, payload in payloads:
+        for codec in CODECS.values():
+            document = codec.dumps(payload).encode('utf-8')
+            assert codec.loads(document) == payload
+            decode = measure(codec.loads, document, runs)
+            encode = measure(codec.dumps, payload, runs)
+            print('%-22s %-6s %10.0f %12.2f %12.2f' % (name, codec.name, len(document) / 1024, decode, encode))
+
+
+if __name__ == '__main__':
+    main()
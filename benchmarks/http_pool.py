@@ -0,0 +1,63 @@
+"""
+Message in a Bottle.
+Benchmark of the pooled backend sessions.
+
+It measures the p50/p99 latency of UserManager.get_user_by_id
+against a local stub of the users microservice, first opening
+a new connection for each call (as the gateway did before) and
+then reusing the keep-alive pool of the backend.
+
+Usage: FLASK_ENV=testing python -m benchmarks.http_pool [calls]
+"""
+import sys
+import time
+import requests
+
+from benchmarks.stub import start_stub, percentile
+
+
+USER = {
+    'id': 1, 'email': 'mario@rossi.it', 'first_name': 'Mario',
+    'last_name': 'Rossi', 'birthdate': '01/01/1990', 'photo': '', 'points': 0
+}
+
+
+class Unpooled:
+    """
+    Mimics the old behaviour, a new connection for each call.
+    """
+    def get(self, url, **kwargs):
+        return requests.get(url, **kwargs)
+
+
+def run(manager, calls):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        manager.get_user_by_id(1)
+        samples.append((time.perf_counter() - start) * 1000)
+    return percentile(samples, 50), percentile(samples, 99)
+
+
+def main(calls):
+    server = start_stub({'/': {'body': USER}})
+    from mib import create_app
+    app = create_app()
+    from mib.rao.user_manager import UserManager
+    UserManager.USERS_ENDPOINT = server.url
+    pooled = UserManager.backend
+
+    with app.app_context():
+        UserManager.backend = Unpooled()
+        before = run(UserManager, calls)
+        UserManager.backend = pooled
+        after = run(UserManager, calls)
+
+    print('calls: %d' % calls)
+    print('%-10s p50 %7.3f ms   p99 %7.3f ms' % (('before',) + before))
+    print('%-10s p50 %7.3f ms   p99 %7.3f ms' % (('after',) + after))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
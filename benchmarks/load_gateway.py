@@ -0,0 +1,159 @@
+"""
+Message in a Bottle.
+Load test of one gateway container.
+
+It starts the stubs of the users and messages microservices, with
+a latency of --delay seconds, and a gunicorn instance of the gateway
+for each worker class to compare. Then an increasing number of
+concurrent users requests the dashboard, that needs two calls to
+the microservices, and for each level the throughput and the
+latency are printed. The last level with a p99 under --sla seconds
+is the number of concurrent users the container can hold.
+The sessions are kept in redis: with --redis-host the gateway uses
+that redis, otherwise an in-process one, that is not shared between
+processes, so gunicorn then runs a single worker.
+
+Usage: python -m benchmarks.load_gateway [--classes gthread gevent]
+           [--redis-host HOST [--redis-port PORT]]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+from benchmarks.stub import start_stub, percentile
+
+
+USER = {
+    'id': 1, 'email': 'mario@rossi.it', 'first_name': 'Mario',
+    'last_name': 'Rossi', 'birthdate': '01/01/1990', 'photo': '', 'points': 0
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gateway(worker_class, users, messages, port, redis_host=None, redis_port=6379):
+    """
+    Starts gunicorn with the configuration of the container,
+    changing only the worker class, the microservices and redis.
+    """
+    env = dict(os.environ)
+    env.update({
+        'FLASK_ENV': 'production',
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'USERS_MS_PORT': users.server_address[1],
+        'MESSAGES_MS_PORT': messages.server_address[1],
+        'USERS_MS_HOST': '127.0.0.1',
+        'MESSAGES_MS_HOST': '127.0.0.1',
+    })
+    if redis_host:
+        env.update({'REDIS_HOST': redis_host, 'REDIS_PORT': redis_port})
+    else:
+        env.update({'REDIS_IN_PROCESS': 'true', 'GUNICORN_WORKERS': 1})
+    env = {key: str(value) for key, value in env.items()}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn.app.wsgiapp', '--config', 'gunicorn.conf.py',
+         '--bind', '127.0.0.1:%d' % port, '--worker-tmp-dir', '/tmp', 'wsgi:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = 'http://127.0.0.1:%d' % port
+    for _ in range(100):
+        try:
+            requests.get(url + '/login', timeout=1)
+            return process, url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('gunicorn with %s workers did not start' % worker_class)
+
+
+def login(url):
+    session = requests.Session()
+    response = session.post(url + '/login', data={'email': USER['email'], 'password': 'password'},
+                            allow_redirects=False, timeout=10)
+    if response.status_code != 302 or not session.cookies:
+        raise RuntimeError('The login failed with status %d' % response.status_code)
+    return session.cookies
+
+
+def run_level(url, cookies, users, seconds):
+    """
+    Runs users concurrent clients requesting the dashboard
+    :return: (requests per second, p50, p99, errors)
+    """
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client():
+        session = requests.Session()
+        session.cookies.update(cookies)
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = session.get(url + '/', timeout=30, allow_redirects=False).status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    samples.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if not samples:
+        return 0, float('inf'), float('inf'), errors[0]
+    return len(samples) / seconds, percentile(samples, 50), percentile(samples, 99), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[2])
+    parser.add_argument('--classes', nargs='+', default=['gthread', 'gevent'])
+    parser.add_argument('--levels', nargs='+', type=int, default=[8, 16, 32, 64, 128, 256])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--delay', type=float, default=0.05)
+    parser.add_argument('--sla', type=float, default=1.0)
+    parser.add_argument('--redis-host')
+    parser.add_argument('--redis-port', type=int, default=6379)
+    args = parser.parse_args()
+
+    users = start_stub({'/': {'body': USER}}, delay=args.delay)
+    messages = start_stub({'/notifications': {'body': {'inbox': 1, 'sent': 0}}}, delay=args.delay)
+
+    for worker_class in args.classes:
+        process, url = start_gateway(worker_class, users, messages, free_port(),
+                                     args.redis_host, args.redis_port)
+        try:
+            cookies = login(url)
+            held = 0
+            print('worker class: %s' % worker_class)
+            print('%8s %10s %10s %10s %8s' % ('users', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+            for level in args.levels:
+                rps, p50, p99, errors = run_level(url, cookies, level, args.seconds)
+                print('%8d %10.1f %10.1f %10.1f %8d' % (level, rps, p50 * 1000, p99 * 1000, errors))
+                if p99 <= args.sla and errors == 0:
+                    held = level
+            print('concurrent users held with p99 <= %.2fs: %d\n' % (args.sla, held))
+        finally:
+            process.terminate()
+            process.wait()
+
+    users.shutdown()
+    messages.shutdown()
+
+
+if __name__ == '__main__':
+    main()
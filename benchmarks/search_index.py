@@ -0,0 +1,74 @@
+"""
+Message in a Bottle.
+Benchmark of the users search index.
+
+It builds the search index over synthetic users and measures
+the build time, the p50/p99 latency of the searches and the time
+of an incremental sync that changes a few users.
+
+Usage: python -m benchmarks.search_index [users]
+"""
+import random
+import sys
+import time
+
+from mib.auth.user import User
+from mib.rao.search_index import UserSearchIndex
+from benchmarks.stub import percentile
+
+
+FIRST_NAMES = ['Mario', 'Maria', 'Luigi', 'Paola', 'Federico', 'Francesco',
+               'Nicolo', 'Manfredo', 'Giulia', 'Anna', 'Marco', 'Elena']
+LAST_NAMES = ['Rossi', 'Bianchi', 'Verdi', 'Neri', 'Russo', 'Ferrari', 'Esposito',
+              'Romano', 'Colombo', 'Ricci', 'Marino', 'Greco', 'Bruno', 'Gallo']
+DOMAINS = ['mail.it', 'studenti.unipi.it', 'example.com', 'posta.it']
+
+
+def generate_users(count, seed=0):
+    rnd = random.Random(seed)
+    users = []
+    for id in range(1, count + 1):
+        first_name = rnd.choice(FIRST_NAMES)
+        last_name = '%s%d' % (rnd.choice(LAST_NAMES), rnd.randrange(1000))
+        email = '%s.%s%d@%s' % (first_name.lower(), last_name.lower(), id, rnd.choice(DOMAINS))
+        users.append(User(id=id, email=email, first_name=first_name, last_name=last_name,
+                          birthdate='01/01/1990', photo=None, points=0))
+    return users
+
+
+def measure(index, searched_input, runs=200):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        found = index.search(searched_input)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return len(found), percentile(samples, 50), percentile(samples, 99)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = generate_users(count)
+    index = UserSearchIndex()
+
+    start = time.perf_counter()
+    index.sync(users)
+    print('build of %d users: %.0f ms' % (count, (time.perf_counter() - start) * 1000))
+
+    print('%-28s %8s %10s %10s' % ('search', 'found', 'p50 us', 'p99 us'))
+    for searched_input in ['mario.rossi7', 'mario rossi7', 'federico.bruno123@',
+                           'giulia gallo99', 'mario.rossi7@mail.it', 'zzz', 'ross']:
+        found, p50, p99 = measure(index, searched_input)
+        print('%-28s %8d %10.1f %10.1f' % (searched_input, found, p50, p99))
+
+    changed = generate_users(count, seed=1)[:100]
+    for user in changed:
+        user.id = random.Random(user.id).randrange(1, count + 1)
+    by_id = {user.id: user for user in users}
+    by_id.update({user.id: user for user in changed})
+    start = time.perf_counter()
+    index.sync(by_id.values())
+    print('incremental sync of %d changes: %.0f ms' % (len(changed), (time.perf_counter() - start) * 1000))
+
+
+if __name__ == '__main__':
+    main()
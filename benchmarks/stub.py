@@ -0,0 +1,72 @@
+"""
+Message in a Bottle.
+A tiny stub microservice used by the benchmarks.
+
+It answers every request with the JSON payload of the longest
+route that prefixes the path, speaking HTTP/1.1 so that
+keep-alive connections can be reused.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def start_stub(routes, delay=0):
+    """
+    Starts the stub in a daemon thread on a free local port.
+    :param routes: dict path prefix -> python object returned as json
+    :param delay: seconds waited before each answer, to simulate
+        the latency of a real microservice
+    :return: the running server, its url is server.url
+    """
+    bodies = sorted(((prefix, json.dumps(payload).encode('utf-8'))
+                     for prefix, payload in routes.items()),
+                    key=lambda route: len(route[0]), reverse=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def answer(self):
+            # the request body must be consumed to reuse the connection
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+            if delay:
+                time.sleep(delay)
+            body = next((body for prefix, body in bodies
+                         if self.path.startswith(prefix)), None)
+            if body is None:
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_DELETE = answer
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), Handler)
+    server.url = 'http://127.0.0.1:%s' % server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(samples, p):
+    """
+    Returns the p-th percentile of the samples.
+    """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
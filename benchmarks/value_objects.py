@@ -0,0 +1,149 @@
+"""
+Message in a Bottle.
+Benchmark of the User and Message value objects.
+
+It builds lists of 10k users and messages from their json, as the
+gateway does for the directory and the folders, and measures the
+construction time, the serialization time and the memory of each
+object, comparing the slotted classes with the previous dict-backed
+ones, that are reproduced here.
+
+Usage: python -m benchmarks.value_objects [items]
+"""
+import sys
+import time
+import tracemalloc
+
+from mib.auth.user import User
+from mib.rao.message import Message
+
+
+class LegacyUser:
+    """
+    The previous User, a UserMixin with class-level defaults.
+    """
+    id = None
+    photo = None
+    email = None
+    first_name = None
+    last_name = None
+    birthdate = None
+    authenticated = None
+    points = None
+
+    SERIALIZE_LIST = ['id', 'email', 'first_name', 'last_name', 'birthdate', 'photo', 'points']
+
+    @staticmethod
+    def build_from_json(json: dict):
+        kw = {key: json[key] for key in LegacyUser.SERIALIZE_LIST}
+        return LegacyUser(**kw)
+
+    def __init__(self, **kw):
+        self.id = kw["id"]
+        self.photo = kw["photo"]
+        self.email = kw["email"]
+        self.first_name = kw["first_name"]
+        self.last_name = kw["last_name"]
+        self.birthdate = kw["birthdate"]
+        self.points = kw["points"]
+
+    def serialize(self):
+        return {key: getattr(self, key) for key in LegacyUser.SERIALIZE_LIST}
+
+    def __getattr__(self, item):
+        if item in self.__dict__:
+            return self[item]
+        else:
+            raise AttributeError('Attribute %s does not exist' % item)
+
+
+class LegacyMessage:
+    """
+    The previous Message, with class-level defaults.
+    """
+    id = None
+    sender_id = None
+    sender = None
+    receiver_id = -1
+    receiver = None
+    body = None
+    photo = None
+    timestamp = None
+    draft = None
+    scheduled = None
+    sent = 0
+    read = 0
+    bold = None
+    deleted = 0
+    italic = None
+    underline = None
+
+    SERIALIZE_LIST = ['id', 'sender_id', 'receiver_id', 'sender', 'receiver', 'body', 'photo', 'timestamp',
+             'draft', 'scheduled', 'sent', 'read', 'deleted', 'bold', 'italic',
+             'underline']
+
+    @staticmethod
+    def build_from_json(json: dict):
+        kw = {key: json[key] for key in LegacyMessage.SERIALIZE_LIST}
+        return LegacyMessage(**kw)
+
+    def serialize(self):
+        return dict([(k, self.__getattribute__(k)) for k in self.SERIALIZE_LIST])
+
+    def __init__(self, **kw):
+        for key in self.SERIALIZE_LIST:
+            setattr(self, key, kw[key])
+
+    def __getattr__(self, item):
+        if item in self.__dict__:
+            return self[item]
+        else:
+            raise AttributeError('Attribute %s does not exist' % item)
+
+
+def user_json(id):
+    return {'id': id, 'email': 'user%d@mail.it' % id, 'first_name': 'Mario',
+            'last_name': 'Rossi', 'birthdate': '01/01/1990', 'photo': '', 'points': id % 100}
+
+
+def message_json(id):
+    return {'id': id, 'sender_id': 1, 'receiver_id': 2, 'sender': 'a@mail.it',
+            'receiver': 'b@mail.it', 'body': 'Hello %d' % id, 'photo': '',
+            'timestamp': '01/01/2030 10:00', 'draft': False, 'scheduled': True,
+            'sent': 1, 'read': 0, 'deleted': 0, 'bold': False, 'italic': False,
+            'underline': False}
+
+
+def measure(cls, payloads):
+    start = time.perf_counter()
+    objects = [cls.build_from_json(payload) for payload in payloads]
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for item in objects:
+        item.serialize()
+    serialize = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [cls.build_from_json(payload) for payload in payloads]
+    size = (tracemalloc.get_traced_memory()[0] - before) / len(objects)
+    tracemalloc.stop()
+    return build * 1000, serialize * 1000, size
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    users = [user_json(id) for id in range(items)]
+    messages = [message_json(id) for id in range(items)]
+    print('%d items each' % items)
+    print('%-14s %12s %15s %14s' % ('class', 'build ms', 'serialize ms', 'bytes/object'))
+    for cls, payloads in [(LegacyUser, users), (User, users),
+                          (LegacyMessage, messages), (Message, messages)]:
+        # warm up, then take the best of a few runs
+        results = min(measure(cls, payloads) for _ in range(5))
+        print('%-14s %12.1f %15.1f %14.0f' % ((cls.__name__,) + results))
+
+
+if __name__ == '__main__':
+    main()
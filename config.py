@@ -8,7 +8,42 @@ class Config(object):
     # configuring microservices endpoints
     import os
 
+    # the requests served at the same time by a gunicorn worker: its
+    # threads, or its greenlets with GUNICORN_WORKER_CLASS=gevent
+    if os.getenv('GUNICORN_WORKER_CLASS', 'gthread') == 'gevent':
+        WORKER_CONCURRENCY = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    else:
+        WORKER_CONCURRENCY = int(os.getenv('GUNICORN_THREADS', 4))
+
     REQUESTS_TIMEOUT_SECONDS = float(os.getenv("REQUESTS_TIMEOUT_SECONDS", 5))
+    REQUESTS_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REQUESTS_CONNECT_TIMEOUT_SECONDS", 1))
+    # budget of each request of the gateway, shared by all its calls
+    # to the microservices, it must be lower than the gunicorn timeout
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", 25))
+
+    # configuring the connection pool of each microservice
+    REQUESTS_POOL_CONNECTIONS = int(os.getenv("REQUESTS_POOL_CONNECTIONS", 1))
+    # the connections kept for each microservice, one for each request of the worker
+    REQUESTS_POOL_MAXSIZE = int(os.getenv("REQUESTS_POOL_MAXSIZE", max(10, WORKER_CONCURRENCY)))
+    REQUESTS_KEEPALIVE = os.getenv("REQUESTS_KEEPALIVE", "true").lower() == "true"
+    REQUESTS_MAX_RETRIES = int(os.getenv("REQUESTS_MAX_RETRIES", 2))
+    REQUESTS_BACKOFF_FACTOR = float(os.getenv("REQUESTS_BACKOFF_FACTOR", 0.1))
+
+    # configuring the circuit breaker and the bulkhead of each microservice
+    CIRCUIT_BREAKER_WINDOW = int(os.getenv("CIRCUIT_BREAKER_WINDOW", 20))
+    CIRCUIT_BREAKER_MIN_CALLS = int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", 10))
+    CIRCUIT_BREAKER_FAILURE_RATE = float(os.getenv("CIRCUIT_BREAKER_FAILURE_RATE", 0.5))
+    CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", 10))
+    # the requests of a worker that can call the same microservice at the
+    # same time, the calls of a request (also the concurrent ones of
+    # parallel_map) share its slot. It is lower than the WORKER_CONCURRENCY
+    # requests, so a slow microservice cannot hold all of them
+    BULKHEAD_MAX_CONCURRENT = int(os.getenv("BULKHEAD_MAX_CONCURRENT", max(1, WORKER_CONCURRENCY * 3 // 4)))
+    BULKHEAD_WAIT_SECONDS = float(os.getenv("BULKHEAD_WAIT_SECONDS", 0.1))
+
+    # the json codec of the bodies exchanged with the microservices,
+    # orjson, ujson or json, the next one is used if it is not installed
+    JSON_CODEC = os.getenv("JSON_CODEC", "orjson")
 
     # configuring redis
     REDIS_HOST = os.getenv('REDIS_HOST', 'redis_cache')
@@ -19,24 +54,61 @@ class Config(object):
         REDIS_PORT,
         REDIS_DB
     )
+    REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 0.5))
+    # connections of each worker, a thread waits for a free one at most REDIS_POOL_TIMEOUT
+    REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 20))
+    REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 0.1))
+    # the sessions have their own pool, and a longer wait for a free
+    # connection, since a session that is not read logs the user out
+    REDIS_SESSION_MAX_CONNECTIONS = int(os.getenv('REDIS_SESSION_MAX_CONNECTIONS', 20))
+    REDIS_SESSION_POOL_TIMEOUT = float(os.getenv('REDIS_SESSION_POOL_TIMEOUT', 1))
+    # the connections idle for longer are checked with a PING before use
+    REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))
+    # an in-process redis is used instead of REDIS_URL, only for the tests
+    REDIS_IN_PROCESS = os.getenv('REDIS_IN_PROCESS', 'false').lower() == 'true'
+
+    # configuring the caches
+    USER_CACHE_TTL_SECONDS = int(os.getenv('USER_CACHE_TTL_SECONDS', 300))
+    BADWORDS_CACHE_TTL_SECONDS = int(os.getenv('BADWORDS_CACHE_TTL_SECONDS', 60))
+    BADWORDS_CACHE_SIZE = int(os.getenv('BADWORDS_CACHE_SIZE', 10000))
+    NOTIFICATIONS_CACHE_TTL_SECONDS = int(os.getenv('NOTIFICATIONS_CACHE_TTL_SECONDS', 10))
+    DIRECTORY_CACHE_FRESH_SECONDS = int(os.getenv('DIRECTORY_CACHE_FRESH_SECONDS', 60))
+    DIRECTORY_CACHE_MAX_STALE_SECONDS = int(os.getenv('DIRECTORY_CACHE_MAX_STALE_SECONDS', 3600))
+    SEARCH_INDEX_REFRESH_SECONDS = int(os.getenv('SEARCH_INDEX_REFRESH_SECONDS', 30))
+
+    # seconds the browsers can keep the photos served by the gateway
+    MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 86400))
 
     # users microservice
     USERS_MS_PROTO = os.getenv('USERS_MS_PROTO', 'http')
     USERS_MS_HOST = os.getenv('USERS_MS_HOST', 'localhost')
     USERS_MS_PORT = os.getenv('USERS_MS_PORT', 5001)
     USERS_MS_URL = '%s://%s:%s' % (USERS_MS_PROTO, USERS_MS_HOST, USERS_MS_PORT)
+    USERS_LOOKUP_CONCURRENCY = int(os.getenv('USERS_LOOKUP_CONCURRENCY', 8))
+    USERS_MS_MAX_CONCURRENT = int(os.getenv('USERS_MS_MAX_CONCURRENT', BULKHEAD_MAX_CONCURRENT))
+    USERS_MS_CONNECT_TIMEOUT = float(os.getenv('USERS_MS_CONNECT_TIMEOUT', REQUESTS_CONNECT_TIMEOUT_SECONDS))
+    USERS_MS_READ_TIMEOUT = float(os.getenv('USERS_MS_READ_TIMEOUT', REQUESTS_TIMEOUT_SECONDS))
 
     # messages microservice
     MESSAGES_MS_PROTO = os.getenv('MESSAGES_MS_PROTO', 'http')
     MESSAGES_MS_HOST = os.getenv('MESSAGES_MS_HOST', 'localhost')
     MESSAGES_MS_PORT = os.getenv('MESSAGES_MS_PORT', 5002)
     MESSAGES_MS_URL = '%s://%s:%s' % (MESSAGES_MS_PROTO, MESSAGES_MS_HOST, MESSAGES_MS_PORT)
+    MESSAGES_SEND_CONCURRENCY = int(os.getenv('MESSAGES_SEND_CONCURRENCY', 8))
+    MESSAGES_MS_MAX_CONCURRENT = int(os.getenv('MESSAGES_MS_MAX_CONCURRENT', BULKHEAD_MAX_CONCURRENT))
+    MESSAGES_MS_CONNECT_TIMEOUT = float(os.getenv('MESSAGES_MS_CONNECT_TIMEOUT', REQUESTS_CONNECT_TIMEOUT_SECONDS))
+    MESSAGES_MS_READ_TIMEOUT = float(os.getenv('MESSAGES_MS_READ_TIMEOUT', REQUESTS_TIMEOUT_SECONDS))
+    # 0 shows the whole folders, streamed while they are read
+    MAILBOX_PAGE_SIZE = int(os.getenv('MAILBOX_PAGE_SIZE', 20))
 
     # lottery microservice
     LOTTERY_MS_PROTO = os.getenv('LOTTERY_MS_PROTO', 'http')
     LOTTERY_MS_HOST = os.getenv('LOTTERY_MS_HOST', 'localhost')
     LOTTERY_MS_PORT = os.getenv('LOTTERY_MS_PORT', 5003)
     LOTTERY_MS_URL = '%s://%s:%s' % (LOTTERY_MS_PROTO, LOTTERY_MS_HOST, LOTTERY_MS_PORT)
+    LOTTERY_MS_MAX_CONCURRENT = int(os.getenv('LOTTERY_MS_MAX_CONCURRENT', BULKHEAD_MAX_CONCURRENT))
+    LOTTERY_MS_CONNECT_TIMEOUT = float(os.getenv('LOTTERY_MS_CONNECT_TIMEOUT', REQUESTS_CONNECT_TIMEOUT_SECONDS))
+    LOTTERY_MS_READ_TIMEOUT = float(os.getenv('LOTTERY_MS_READ_TIMEOUT', REQUESTS_TIMEOUT_SECONDS))
 
     """ # notifications
     NOTIFICATIONS_MS_PROTO = os.getenv('NOTIFICATIONS_MS_PROTO', 'http')
@@ -44,8 +116,14 @@ class Config(object):
     NOTIFICATIONS_MS_PORT = os.getenv('NOTIFICATIONS_MS_PORT', 5004)
     NOTIFICATIONS_MS_URL = '%s://%s:%s' % (NOTIFICATIONS_MS_PROTO, NOTIFICATIONS_MS_HOST, NOTIFICATIONS_MS_PORT)
  """
-    # Configuring sessions
+    # Configuring sessions, kept in redis
     SESSION_TYPE = 'redis'
+    SESSION_KEY_PREFIX = 'session:'
+    SESSION_USE_SIGNER = os.getenv('SESSION_USE_SIGNER', 'false').lower() == 'true'
+    SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', 86400))
+    PERMANENT_SESSION_LIFETIME = SESSION_TTL_SECONDS
+    # seconds the snapshot of the logged user in the session is trusted
+    SESSION_USER_SNAPSHOT_SECONDS = int(os.getenv('SESSION_USER_SNAPSHOT_SECONDS', 60))
 
     # secret key
     SECRET_KEY = os.getenv('APP_SECRET_KEY', b'isreallynotsecretatall')
@@ -78,6 +156,7 @@ class TestConfig(Config):
     SECRET_KEY = 'a_very_useful_secret_key'
     WTF_CSRF_ENABLED = False
     LOGIN_DISABLED = True
+    REDIS_IN_PROCESS = True
 
 
 class ProdConfig(Config):
@@ -5,6 +5,7 @@ Gunicorn configuration file
 This file is the configuration file for gunicorn, the
 WSGI server of mib-api-gateway microservice.
 """
+import os
 
 # the bind address
 bind = '0.0.0.0:5000'
@@ -14,11 +15,16 @@ backlog = 2048
 # Tuning the workers as specified in this article
 # https://pythonspeed.com/articles/gunicorn-in-docker/
 #
-workers = 2
-threads = 4
+# The gateway only waits for the microservices, so it can also run
+# in async mode with GUNICORN_WORKER_CLASS=gevent: each worker serves
+# up to worker_connections requests, and the calls to the
+# microservices (also the concurrent ones) become cooperative.
+#
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
 worker_tmp_dir = '/dev/shm'
-worker_class = 'gthread'
-worker_connections = 1000
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
 timeout = 30
 keepalive = 2
 
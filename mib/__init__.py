@@ -3,12 +3,16 @@ import os
 from flask import Flask
 from flask_bootstrap import Bootstrap
 from flask_environments import Environments
+from flask_redis import FlaskRedis
 from base64 import b64encode
 
 
 __version__ = '0.1'
 
 login = None
+# the redis client of the gateway, shared by all the caches,
+# it is the same object for each app, so it can be imported by the caches
+redis_client = FlaskRedis()
 #debug_toolbar = None
 app = None
 
@@ -67,6 +71,66 @@ def register_extensions(app):
     # adding bootstrap
     Bootstrap(app)
 
+    # adding redis
+    init_redis_client(app)
+    # the sessions are kept in redis too, with their own pool
+    from mib.auth.session import GatewaySessionInterface
+    app.session_interface = GatewaySessionInterface(
+        build_session_redis(app),
+        key_prefix=app.config['SESSION_KEY_PREFIX'],
+        ttl_seconds=app.config['SESSION_TTL_SECONDS'],
+        use_signer=app.config['SESSION_USE_SIGNER']
+    )
+
+
+def init_redis_client(app):
+    """
+    It builds the redis client shared by the whole gateway, with a
+    bounded pool of connections to REDIS_URL, or an in-process redis
+    if REDIS_IN_PROCESS is set, e.g. for the tests.
+    The caches must not block the requests if the redis instance
+    is not reachable, so all the waits are short.
+    :param app: Flask Application Object
+    :return: the redis client
+    """
+    from mib.rao.redis_store import GatewayRedis, in_process_provider
+    if app.config['REDIS_IN_PROCESS']:
+        redis_client.provider_class = in_process_provider()
+    else:
+        redis_client.provider_class = GatewayRedis
+    redis_client.init_app(
+        app,
+        max_connections=app.config['REDIS_MAX_CONNECTIONS'],
+        timeout=app.config['REDIS_POOL_TIMEOUT'],
+        socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        socket_connect_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        health_check_interval=app.config['REDIS_HEALTH_CHECK_INTERVAL']
+    )
+    return redis_client
+
+
+def build_session_redis(app):
+    """
+    It builds the redis client of the sessions. It has its own pool,
+    so the caches cannot take the connections needed to read the
+    sessions, and it waits longer for a free one, since a session
+    that is not read logs the user out for the request.
+    With REDIS_IN_PROCESS the in-process redis is shared.
+    :param app: Flask Application Object
+    :return: the redis client
+    """
+    from mib.rao.redis_store import GatewayRedis
+    if app.config['REDIS_IN_PROCESS']:
+        return redis_client
+    return GatewayRedis.from_url(
+        app.config['REDIS_URL'],
+        max_connections=app.config['REDIS_SESSION_MAX_CONNECTIONS'],
+        timeout=app.config['REDIS_SESSION_POOL_TIMEOUT'],
+        socket_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        socket_connect_timeout=app.config['REDIS_SOCKET_TIMEOUT'],
+        health_check_interval=app.config['REDIS_HEALTH_CHECK_INTERVAL']
+    )
+
 
 def register_blueprints(app):
     """
@@ -77,6 +141,9 @@ def register_blueprints(app):
     from mib.views import blueprints
     for bp in blueprints:
         app.register_blueprint(bp, url_prefix='/')
+    # the templates call flush() to send the shell of the streamed pages
+    from mib.views.utils import flush
+    app.add_template_global(flush)
 
 
 def register_test_blueprints(app):
@@ -96,7 +163,8 @@ def register_handlers(app):
     :param app: application object
     :return: None
     """
-    from .handlers import page_404, error_500
+    from .handlers import page_404, error_500, start_deadline
 
     app.register_error_handler(404, page_404)
     app.register_error_handler(500, error_500)
+    app.before_request(start_deadline)
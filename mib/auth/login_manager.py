@@ -1,5 +1,6 @@
 from flask_login import LoginManager
 from mib.rao.user_manager import UserManager
+from mib.auth.session import load_user_snapshot, remember_user
 
 
 def init_login_manager(app):
@@ -10,13 +11,19 @@ def init_login_manager(app):
     @login_manager.user_loader
     def load_user(user_id):
         """
-        We need to connect to users endpoint and load the user.
-        Here we can implement the redis caching
+        We need to connect to users endpoint and load the user,
+        unless the user is already in the session or in the redis cache.
 
         :param user_id: user id
         :return: the user object
         """
-        user = UserManager.get_user_by_id(user_id)
+        user = load_user_snapshot(user_id, app.config['SESSION_USER_SNAPSHOT_SECONDS'])
+        if user is None:
+            user = UserManager.get_users_by_ids([user_id]).get(user_id)
+            if user is None:
+                # the user was deleted, the session is anonymous
+                return None
+            remember_user(user)
         user.authenticated = True
         return user
     return login_manager
\ No newline at end of file
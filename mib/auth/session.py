@@ -0,0 +1,159 @@
+import time
+from flask import current_app, has_request_context, session
+from flask_session.sessions import RedisSessionInterface
+from itsdangerous import BadSignature, want_bytes
+from redis.exceptions import RedisError
+from mib.auth.user import User
+from mib.rao import codec
+
+# key of the session with the snapshot of the logged user
+USER_SNAPSHOT_KEY = '_user'
+
+
+class GatewaySessionInterface(RedisSessionInterface):
+    """
+    The sessions are kept in redis and the cookie carries only their id.
+    Unlike the redis interface of Flask-Session, the session is
+    serialized with the json codec instead of pickle, it is written
+    only when it is modified and its ttl is renewed while it is read,
+    in the same round trip. So the values in the session
+    must be strings, numbers, booleans, None, lists and dicts.
+    If redis is not reachable the session is read as empty, and
+    a new session (e.g. the one of a login) cannot be stored,
+    so the request fails instead of losing it.
+    """
+    serializer = codec
+
+    def __init__(self, redis, key_prefix, ttl_seconds, use_signer=False, permanent=True):
+        super(GatewaySessionInterface, self).__init__(redis, key_prefix, use_signer, permanent)
+        self.ttl_seconds = ttl_seconds
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(app.session_cookie_name)
+        if sid and self.use_signer:
+            try:
+                sid = self._get_signer(app).unsign(sid).decode()
+            except BadSignature:
+                sid = None
+        if not sid:
+            return self._new_session(self._generate_sid())
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.get(self.key_prefix + sid)
+            pipe.expire(self.key_prefix + sid, self.ttl_seconds)
+            value, _ = pipe.execute()
+        except RedisError as e:
+            app.logger.warning('Sessions not available: %s' % e)
+            value = None
+        if value is not None:
+            try:
+                return self.session_class(self.serializer.loads(value), sid=sid)
+            except ValueError:
+                pass
+        # an unknown id is never adopted, it could have been chosen by an attacker
+        return self._new_session(self._generate_sid())
+
+    def _new_session(self, sid):
+        session = self.session_class(sid=sid, permanent=self.permanent)
+        # it is not stored until it is modified
+        session.new = True
+        return session
+
+    def regenerate(self, app, session):
+        """
+        Moves the session under a new id, removing the old one from redis
+        :param session: the session of the current request
+        """
+        if not session.new:
+            try:
+                self.redis.delete(self.key_prefix + session.sid)
+            except RedisError as e:
+                app.logger.warning('Sessions not available: %s' % e)
+        session.sid = self._generate_sid()
+        session.new = True
+        session.modified = True
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            if session.modified:
+                try:
+                    self.redis.delete(self.key_prefix + session.sid)
+                except RedisError as e:
+                    app.logger.warning('Sessions not available: %s' % e)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+        if session.modified:
+            try:
+                self.redis.setex(self.key_prefix + session.sid, self.ttl_seconds,
+                                 self.serializer.dumps(dict(session)))
+            except RedisError as e:
+                if session.new:
+                    # without the cookie the user would be back
+                    # to the login page, without knowing why
+                    raise
+                app.logger.warning('Sessions not available: %s' % e)
+                return
+        if session.modified or (not session.new and self.should_set_cookie(app, session)):
+            if self.use_signer:
+                session_id = self._get_signer(app).sign(want_bytes(session.sid))
+            else:
+                session_id = session.sid
+            response.set_cookie(app.session_cookie_name, session_id,
+                                expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app),
+                                domain=domain, path=path,
+                                secure=self.get_cookie_secure(app))
+
+
+def regenerate_session():
+    """
+    Gives a new id to the session of the current request, it must be
+    called when the user logs in, so an id known before the login
+    is not valid for the logged user
+    """
+    current_app.session_interface.regenerate(current_app, session)
+
+
+def remember_user(user):
+    """
+    Keeps a snapshot of the logged user in the session,
+    so the next requests can load it without contacting
+    the users microservice or the users cache.
+    The photo is left out, since the session is read on each
+    request, the pages show it through the media endpoint.
+    :param user: the User obj
+    """
+    fields = user.serialize()
+    fields['photo'] = None
+    session[USER_SNAPSHOT_KEY] = [time.time(), fields]
+
+
+def load_user_snapshot(user_id, max_age):
+    """
+    :param user_id: the id of the logged user, as string
+    :param max_age: the seconds after which the snapshot is too old
+    :return: the User obj of the snapshot, without the photo,
+        None if it is missing, too old or of another user
+    """
+    snapshot = session.get(USER_SNAPSHOT_KEY)
+    if snapshot is None:
+        return None
+    taken_at, fields = snapshot
+    if time.time() - taken_at > max_age or str(fields['id']) != str(user_id):
+        return None
+    return User.build_from_json(fields)
+
+
+def forget_user(user_id):
+    """
+    Removes the snapshot of the user with user_id from the session
+    of the current request, it must be called each time the user
+    is modified or deleted
+    """
+    if not has_request_context():
+        return
+    snapshot = session.get(USER_SNAPSHOT_KEY)
+    if snapshot is not None and str(snapshot[1]['id']) == str(user_id):
+        session.pop(USER_SNAPSHOT_KEY)
@@ -1,4 +1,9 @@
-from flask import render_template
+from flask import current_app, render_template
+from mib.rao import deadline
+
+
+def start_deadline():
+    deadline.start(current_app.config['REQUEST_DEADLINE_SECONDS'])
 
 
 def page_404(e):
@@ -0,0 +1,339 @@
+import os
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from flask import has_request_context, request
+from mib import app
+from mib.rao import codec, deadline
+from mib.rao.circuit_breaker import CircuitBreaker
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+
+class BackendUnavailable(requests.exceptions.ConnectionError):
+    """
+    Raised without contacting the backend when its circuit is open
+    or when too many calls to it are already running. It is a
+    ConnectionError, so the managers turn it into abort(500).
+    """
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Raised without contacting the backend when the request of the
+    gateway has no budget left. It is a Timeout, so the managers
+    turn it into abort(500).
+    """
+
+
+class Backend:
+    """
+    It represents one of the microservices contacted by the gateway.
+    Each backend keeps its own pool of keep-alive connections,
+    shared by all the threads of the worker, so consecutive calls
+    do not pay a new TCP (and TLS) handshake.
+    A circuit breaker makes the calls fail fast while the backend
+    is failing, and a bulkhead caps the requests of the worker that
+    are calling it at the same time, so a slow backend cannot hold
+    all the threads of the worker. The calls of a request, also the
+    concurrent ones of parallel_map, share the slot of the request,
+    and a streamed response keeps it until it is closed.
+    The timeouts of each attempt are bounded by the deadline of the
+    request, and the remaining budget is sent to the backend, so the
+    failed attempts are retried only while the request has budget left.
+    The json bodies are encoded, and the responses decoded,
+    by the codec of the gateway instead of the json module.
+    """
+    # Only these methods are retried on a read error or a bad gateway,
+    # POST and PATCH are retried only if the request was not sent
+    IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'])
+    RETRY_STATUS_CODES = frozenset([502, 503, 504])
+    # the milliseconds left to the deadline of the request
+    DEADLINE_HEADER = 'X-Request-Budget-Ms'
+    # the slots of the bulkheads held by a request are kept in its
+    # environ, shared with the copies of the request context
+    BULKHEAD_ENVIRON_KEY = 'mib.bulkhead'
+
+    def __init__(self, name, endpoint):
+        self.name = name
+        self.endpoint = endpoint
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker(
+            window=app.config['CIRCUIT_BREAKER_WINDOW'],
+            min_calls=app.config['CIRCUIT_BREAKER_MIN_CALLS'],
+            failure_rate=app.config['CIRCUIT_BREAKER_FAILURE_RATE'],
+            open_seconds=app.config['CIRCUIT_BREAKER_OPEN_SECONDS']
+        )
+        self.max_concurrent = app.config.get(
+            '%s_MS_MAX_CONCURRENT' % name.upper(), app.config['BULKHEAD_MAX_CONCURRENT'])
+        self._bulkhead = threading.BoundedSemaphore(self.max_concurrent)
+        self._slots_lock = threading.Lock()
+        self.connect_timeout = app.config.get(
+            '%s_MS_CONNECT_TIMEOUT' % name.upper(), app.config['REQUESTS_CONNECT_TIMEOUT_SECONDS'])
+        self.read_timeout = app.config.get(
+            '%s_MS_READ_TIMEOUT' % name.upper(), app.config['REQUESTS_TIMEOUT_SECONDS'])
+
+    @property
+    def session(self):
+        """
+        The pooled session of the backend.
+        gunicorn forks the workers, so the pool is built
+        lazily and never shared between two processes.
+        """
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self.build_session()
+                    self._pid = pid
+        return self._session
+
+    def build_session(self):
+        """
+        Builds a new session with the pool policies specified
+        in the configuration. The session does not retry, the
+        retries are made by request within the deadline.
+        :return: requests Session object
+        """
+        adapter = HTTPAdapter(
+            pool_connections=app.config['REQUESTS_POOL_CONNECTIONS'],
+            pool_maxsize=app.config['REQUESTS_POOL_MAXSIZE'],
+            max_retries=0
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        # the session is shared between users, so it must not keep cookies
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        if not app.config['REQUESTS_KEEPALIVE']:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def close(self):
+        """
+        Closes all the pooled connections of the backend.
+        """
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._pid = None
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends the request, retrying it at most REQUESTS_MAX_RETRIES
+        times on connection errors, timeouts and bad gateways. Each
+        attempt gets the timeouts and the budget left to the request,
+        and no attempt is made once the budget is spent.
+        :raise DeadlineExceeded: if the request has no budget left
+        :raise BackendUnavailable: if the call is not sent
+        """
+        self.encode_json(kwargs)
+        attempt = 0
+        while True:
+            try:
+                response = self.send(method, url, dict(kwargs))
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                backoff = self.retry_backoff(attempt) if self.is_retryable(method, e) else None
+                if backoff is None:
+                    raise
+            else:
+                if method not in self.IDEMPOTENT_METHODS or \
+                        response.status_code not in self.RETRY_STATUS_CODES:
+                    return response
+                backoff = self.retry_backoff(attempt)
+                if backoff is None:
+                    return response
+                # a streamed response gives back its connection and its slot
+                response.close()
+            time.sleep(backoff)
+            attempt += 1
+
+    def send(self, method, url, kwargs):
+        """
+        Sends one attempt of the request through the bulkhead and the
+        circuit breaker. Connection errors, timeouts and 5xx responses
+        are failures.
+        :raise DeadlineExceeded: if the request has no budget left
+        :raise BackendUnavailable: if the call is not sent
+        """
+        self.apply_deadline(kwargs)
+        release = self.acquire_slot()
+        if release is None:
+            raise BackendUnavailable('Too many concurrent requests to %s' % self.name)
+        try:
+            permit = self.breaker.allow()
+            if not permit:
+                raise BackendUnavailable('The circuit of %s is open' % self.name)
+            success = None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                success = response.status_code < 500
+                # the managers keep calling response.json()
+                response.json = lambda **kwargs: codec.loads(response.content)
+                if kwargs.get('stream'):
+                    # the body is still to be read, the slot is released by close
+                    response.close = _then(response.close, release)
+                    release = None
+                return response
+            except requests.exceptions.RequestException:
+                success = False
+                raise
+            finally:
+                if self.breaker.record(success, permit):
+                    app.logger.warning('The circuit of %s is open for %ss',
+                        self.name, self.breaker.open_seconds)
+        finally:
+            if release is not None:
+                release()
+
+    def acquire_slot(self):
+        """
+        Takes a slot of the bulkhead for the call, or shares the one
+        already held by the request of the call
+        :return: the function that releases the slot, called once,
+            None if the bulkhead is full
+        """
+        if not has_request_context():
+            if not self._bulkhead.acquire(timeout=app.config['BULKHEAD_WAIT_SECONDS']):
+                return None
+            return _once(self._bulkhead.release)
+        # [calls running, slots held] of the request
+        held = request.environ.setdefault(self.BULKHEAD_ENVIRON_KEY, {})
+        with self._slots_lock:
+            slots = held.setdefault(self.name, [0, 0])
+            shared = slots[0] > 0
+            if shared:
+                slots[0] += 1
+        if not shared:
+            if not self._bulkhead.acquire(timeout=app.config['BULKHEAD_WAIT_SECONDS']):
+                return None
+            with self._slots_lock:
+                slots[0] += 1
+                slots[1] += 1
+
+        def release():
+            with self._slots_lock:
+                slots[0] -= 1
+                if slots[0]:
+                    return
+                taken, slots[1] = slots[1], 0
+            for _ in range(taken):
+                self._bulkhead.release()
+        return _once(release)
+
+    def is_retryable(self, method, error):
+        """
+        :param error: the ConnectionError or Timeout of an attempt
+        :return: True if the attempt can be repeated
+        """
+        if isinstance(error, (BackendUnavailable, DeadlineExceeded)):
+            return False
+        if method in self.IDEMPOTENT_METHODS:
+            return True
+        return not self.was_sent(error)
+
+    def was_sent(self, error):
+        """
+        :param error: the ConnectionError or Timeout of a call
+        :return: False if the request surely did not reach the backend,
+            True if the backend may have received (and executed) it
+        """
+        if isinstance(error, (BackendUnavailable, DeadlineExceeded)):
+            return False
+        # the connection was not established, so the request was not sent
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return not (isinstance(error, requests.exceptions.ConnectTimeout) or
+            isinstance(reason, NewConnectionError))
+
+    def retry_backoff(self, attempt):
+        """
+        :param attempt: the number of the failed attempt, 0 for the first
+        :return: the seconds to wait before the next attempt, that double
+            at each retry, None if there are no retries left or if the
+            request would have no budget left after the wait
+        """
+        if attempt >= app.config['REQUESTS_MAX_RETRIES']:
+            return None
+        backoff = app.config['REQUESTS_BACKOFF_FACTOR'] * (2 ** attempt)
+        budget = deadline.remaining()
+        if budget is not None and budget <= backoff:
+            return None
+        return backoff
+
+    def apply_deadline(self, kwargs):
+        """
+        Sets the timeouts of the call, bounded by the budget left to the
+        request. The ones of the backend are used, unless the call
+        gives its own timeout, e.g. for an endpoint slower than the others.
+        :param kwargs: the arguments of the call, updated in place
+        """
+        timeout = kwargs.get('timeout', (self.connect_timeout, self.read_timeout))
+        budget = deadline.remaining()
+        if budget is not None:
+            if budget <= 0:
+                raise DeadlineExceeded('The deadline of the request is expired')
+            if isinstance(timeout, tuple):
+                timeout = tuple(min(value, budget) for value in timeout)
+            else:
+                timeout = min(timeout, budget)
+            headers = dict(kwargs.get('headers') or {})
+            headers[self.DEADLINE_HEADER] = str(int(budget * 1000))
+            kwargs['headers'] = headers
+        kwargs['timeout'] = timeout
+
+    def encode_json(self, kwargs):
+        """
+        Encodes the json argument of the call, if any, as its body
+        :param kwargs: the arguments of the call, updated in place
+        """
+        if kwargs.get('json') is None:
+            kwargs.pop('json', None)
+            return
+        kwargs['data'] = codec.dumps(kwargs.pop('json')).encode('utf-8')
+        headers = dict(kwargs.get('headers') or {})
+        headers.setdefault('Content-Type', codec.CONTENT_TYPE)
+        kwargs['headers'] = headers
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+def _once(function):
+    """
+    :return: function, that does nothing after the first call
+    """
+    called = []
+
+    def call():
+        if not called:
+            called.append(True)
+            function()
+    return call
+
+
+def _then(function, after):
+    """
+    :return: function, that calls after once it has returned
+    """
+    def call(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        finally:
+            after()
+    return call
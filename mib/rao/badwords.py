@@ -0,0 +1,115 @@
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from mib import app
+
+
+class MessageBody:
+    """
+    It is a message body split in words only once,
+    so it can be checked against the badwords of many users.
+    The result of each distinct list of badwords is remembered.
+    """
+
+    def __init__(self, text):
+        # deletes comma, dot, etc..
+        tokens = [token for token in re.split(r'\W', text or '') if token]
+        self.words = frozenset(tokens)
+        self.text = ' %s ' % ' '.join(tokens)
+        self._results = {}
+
+    def contains(self, matcher):
+        """
+        :param matcher: the BadwordsMatcher of a user
+        :return: True if the body contains one of the badwords
+        """
+        if matcher.key not in self._results:
+            self._results[matcher.key] = matcher.matches(self)
+        return self._results[matcher.key]
+
+
+class BadwordsMatcher:
+    """
+    It is the compiled form of the badwords list of a user:
+    single words are looked up in a set, while phrases
+    are searched in the normalized text of the body.
+    """
+
+    def __init__(self, badwords):
+        words = set()
+        phrases = set()
+        for badword in badwords:
+            tokens = [token for token in re.split(r'\W', badword) if token]
+            if len(tokens) == 1:
+                words.add(tokens[0])
+            elif len(tokens) > 1:
+                phrases.add(' %s ' % ' '.join(tokens))
+        self.words = frozenset(words)
+        self.phrases = frozenset(phrases)
+        self.key = (self.words, self.phrases)
+
+    def matches(self, body: MessageBody):
+        if not self.words.isdisjoint(body.words):
+            return True
+        return any(phrase in body.text for phrase in self.phrases)
+
+
+class BadwordsCache:
+    """
+    It keeps in memory the compiled badwords of the users,
+    for at most TTL_SECONDS since each worker only sees its own
+    invalidations. Users with the same badwords share the matcher.
+    """
+    TTL_SECONDS = app.config['BADWORDS_CACHE_TTL_SECONDS']
+    MAX_SIZE = app.config['BADWORDS_CACHE_SIZE']
+
+    _matchers = OrderedDict()
+    _shared = weakref.WeakValueDictionary()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        :param user_id: the user id
+        :return: the BadwordsMatcher of the user or None
+        """
+        with cls._lock:
+            cached = cls._matchers.get(str(user_id))
+        if cached is None:
+            return None
+        matcher, expiration = cached
+        if expiration < time.monotonic():
+            cls.invalidate(user_id)
+            return None
+        return matcher
+
+    @classmethod
+    def put(cls, user_id, badwords):
+        """
+        Compiles and stores the badwords of the user.
+        :param user_id: the user id
+        :param badwords: the list of badwords
+        :return: the BadwordsMatcher of the user
+        """
+        matcher = BadwordsMatcher(badwords)
+        expiration = time.monotonic() + cls.TTL_SECONDS
+        with cls._lock:
+            # reuse the matcher of another user with the same badwords
+            matcher = cls._shared.setdefault(matcher.key, matcher)
+            cls._matchers[str(user_id)] = (matcher, expiration)
+            cls._matchers.move_to_end(str(user_id))
+            while len(cls._matchers) > cls.MAX_SIZE:
+                cls._matchers.popitem(last=False)
+        return matcher
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """
+        Removes the badwords of the user, it must be called
+        each time the badwords of the user are modified.
+        :param user_id: the user id
+        """
+        with cls._lock:
+            cls._matchers.pop(str(user_id), None)
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+    """
+    It keeps the outcome of the last calls to a backend.
+    When too many of them failed the circuit opens and the calls
+    fail fast for OPEN_SECONDS, then it becomes half-open and one
+    trial call at a time is let through: if it succeeds the circuit
+    is closed again, otherwise it is opened for another period.
+    While half-open only the outcome of the trial call counts, the
+    calls allowed before the circuit opened say nothing about now.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, window, min_calls, failure_rate, open_seconds):
+        """
+        :param window: the number of last calls considered
+        :param min_calls: the calls needed before the circuit can open
+        :param failure_rate: the rate of failed calls that opens the circuit
+        :param open_seconds: how long the circuit stays open
+        """
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self._outcomes = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0
+        self._trial = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._open_expired():
+                return self.HALF_OPEN
+            return self._state
+
+    def _open_expired(self):
+        return time.monotonic() - self._opened_at >= self.open_seconds
+
+    def allow(self):
+        """
+        Must be called before each call to the backend
+        :return: the permit of the call, to be passed to record,
+            or False if the call must fail fast
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if not self._open_expired():
+                    return False
+                self._state = self.HALF_OPEN
+            # half-open, only one trial call at a time
+            if self._trial is not None:
+                return False
+            self._trial = object()
+            return self._trial
+
+    def record(self, success, permit=True):
+        """
+        Must be called after each allowed call to the backend
+        :param success: True if the call succeeded, False if it failed,
+            None if the outcome says nothing about the backend
+        :param permit: the permit returned by allow for the call
+        :return: True if this outcome opened the circuit
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if permit is not self._trial:
+                    # a call allowed before the circuit opened
+                    return False
+                self._trial = None
+                if success is None:
+                    return False
+                if success:
+                    self._state = self.CLOSED
+                    self._outcomes.clear()
+                    return False
+                return self._open()
+            if success is None or self._state != self.CLOSED:
+                return False
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and \
+                    failures >= self.failure_rate * len(self._outcomes):
+                return self._open()
+            return False
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        return True
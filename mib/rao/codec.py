@@ -0,0 +1,128 @@
+import json
+from mib import app
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the media type of the bodies exchanged with the microservices
+CONTENT_TYPE = 'application/json'
+
+
+class JsonCodec:
+    """
+    The json module of the standard library, it is always available.
+    """
+    name = 'json'
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return json.dumps(obj, separators=(',', ':'))
+
+
+class UJsonCodec:
+    """
+    ujson, written in C, encodes the large payloads (the directory,
+    the folders and the photos) about twice as fast as json, while
+    it decodes the long strings of the photos slower than it.
+    Unlike json, it does not refuse the values that are not json
+    types, e.g. it sends a date as a timestamp, so the bodies must
+    contain only strings, numbers, booleans, None, lists and dicts.
+    """
+    name = 'ujson'
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        # the photos are base64 encoded, escaping their slashes
+        # would only make the bodies longer
+        return ujson.dumps(obj, escape_forward_slashes=False)
+
+
+class OrJsonCodec:
+    """
+    orjson, written in Rust, is the fastest of the codecs both
+    on the many small fields of the folders and on the long
+    strings of the photos. It is the default codec and a production
+    requirement, the development and test environments may not
+    have it, then the next installed codec is used.
+    """
+    name = 'orjson'
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+    @staticmethod
+    def dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+
+
+# from the fastest to the slowest
+CODECS = {codec.name: codec for codec in (OrJsonCodec, UJsonCodec, JsonCodec)}
+
+
+def installed(name):
+    """
+    :return: True if the module of the codec with name can be used
+    """
+    return name == JsonCodec.name or globals()[name] is not None
+
+
+def get_codec(name):
+    """
+    :param name: the name of the codec, e.g. 'ujson'
+    :return: the codec, or the fastest installed codec slower
+        than it if the requested one is not installed
+    """
+    if name not in CODECS:
+        raise ValueError('Unknown json codec %s' % name)
+    names = list(CODECS)
+    for candidate in names[names.index(name):]:
+        if installed(candidate):
+            break
+    if candidate != name:
+        app.logger.warning('%s is not installed, the %s codec is used' % (name, candidate))
+    return CODECS[candidate]
+
+
+# the codec used by the backends and the caches
+codec = get_codec(app.config['JSON_CODEC'])
+
+
+def use(name):
+    """
+    Replaces the codec used by the backends and the caches
+    :param name: the name of the codec, e.g. 'json'
+    """
+    global codec
+    codec = get_codec(name)
+
+
+def loads(data):
+    """
+    :param data: the json document, as str or bytes
+    :return: the decoded object
+    :raise ValueError: if data is not valid json
+    """
+    return codec.loads(data)
+
+
+def dumps(obj):
+    """
+    :return: the compact json document of obj, as str
+    """
+    return codec.dumps(obj)
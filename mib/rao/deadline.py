@@ -0,0 +1,28 @@
+import time
+from flask import has_request_context, request
+
+# the deadline is kept in the environ of the request, since it is
+# shared with the copies of the request context used by the threads
+# of parallel_map and gather
+ENVIRON_KEY = 'mib.deadline'
+
+
+def start(seconds):
+    """
+    Sets the deadline of the current request
+    :param seconds: the budget of the whole request
+    """
+    request.environ[ENVIRON_KEY] = time.monotonic() + seconds
+
+
+def remaining():
+    """
+    :return: the seconds left before the deadline of the current request,
+        None outside a request or if the request has no deadline
+    """
+    if not has_request_context():
+        return None
+    deadline = request.environ.get(ENVIRON_KEY)
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
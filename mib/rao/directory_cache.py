@@ -0,0 +1,80 @@
+import time
+from redis.exceptions import RedisError
+from mib import app, redis_client
+from mib.rao import codec
+
+
+class DirectoryCache:
+    """
+    It keeps in redis the directory, the list of all the users.
+    For FRESH_SECONDS it is served as it is, then it becomes stale:
+    it is still served immediately, while one of the gateways
+    refreshes it in background (stale-while-revalidate).
+    After MAX_STALE_SECONDS it expires and it is read again.
+    If redis is not reachable the cache behaves as empty.
+    """
+    KEY = 'users:directory'
+    REFRESH_KEY = 'users:directory:refresh'
+    FRESH_SECONDS = app.config['DIRECTORY_CACHE_FRESH_SECONDS']
+    MAX_STALE_SECONDS = app.config['DIRECTORY_CACHE_MAX_STALE_SECONDS']
+    # a refresh that takes longer is considered failed
+    REFRESH_TIMEOUT_SECONDS = 30
+
+    @classmethod
+    def get(cls):
+        """
+        :return: (the users as sent by the users ms, True if stale) or None
+        """
+        try:
+            cached = redis_client.get(cls.KEY)
+        except RedisError as e:
+            app.logger.warning('Directory cache not available: %s' % e)
+            return None
+        if cached is None:
+            return None
+        directory = codec.loads(cached)
+        stale = time.time() - directory['fetched_at'] > cls.FRESH_SECONDS
+        return directory['users'], stale
+
+    @classmethod
+    def set(cls, users):
+        """
+        Stores the directory for MAX_STALE_SECONDS.
+        :param users: the users as sent by the users ms
+        """
+        payload = codec.dumps({'fetched_at': time.time(), 'users': users})
+        try:
+            redis_client.setex(cls.KEY, cls.MAX_STALE_SECONDS, payload)
+        except RedisError as e:
+            app.logger.warning('Directory cache not available: %s' % e)
+
+    @classmethod
+    def start_refresh(cls):
+        """
+        Takes the refresh of the stale directory, so only one
+        gateway at a time contacts the users microservice.
+        :return: True if the caller must refresh the directory
+        """
+        try:
+            return bool(redis_client.set(cls.REFRESH_KEY, 1, ex=cls.REFRESH_TIMEOUT_SECONDS, nx=True))
+        except RedisError as e:
+            app.logger.warning('Directory cache not available: %s' % e)
+            return False
+
+    @classmethod
+    def end_refresh(cls):
+        try:
+            redis_client.delete(cls.REFRESH_KEY)
+        except RedisError as e:
+            app.logger.warning('Directory cache not available: %s' % e)
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Removes the directory, it must be called each time
+        a user is created, modified or deleted.
+        """
+        try:
+            redis_client.delete(cls.KEY)
+        except RedisError as e:
+            app.logger.warning('Directory cache not available: %s' % e)
@@ -0,0 +1,157 @@
+import codecs
+import json
+
+WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """
+    It reads a json document from the chunks of bytes of a streamed
+    response, so the items of a long array can be decoded one at a
+    time while they arrive, without holding the whole body.
+    Only the part of the document not yet decoded is buffered.
+    Each value is decoded by the json module, that can decode
+    a value in the middle of a string.
+    """
+
+    def __init__(self, chunks):
+        """
+        :param chunks: iterable of bytes, e.g. response.iter_content()
+        """
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder('utf-8')().decode
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _read(self, size = 0):
+        """
+        Appends the next chunks to the buffer, dropping the decoded part.
+        The chunks are joined only once, after at least size characters.
+        :return: False if the document is over
+        """
+        if self._eof:
+            return False
+        parts = [self._buffer[self._pos:]]
+        read = 0
+        while True:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._eof = True
+                text = self._decode(b'', final=True)
+            else:
+                text = self._decode(chunk)
+            parts.append(text)
+            read += len(text)
+            if self._eof or read >= size:
+                break
+        self._buffer = ''.join(parts)
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """
+        :return: the next character that is not a whitespace,
+            '' if the document is over
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read():
+                return ''
+
+    def _expect(self, characters):
+        """
+        Consumes the next character, that must be one of characters
+        :return: the character consumed
+        """
+        character = self._peek()
+        if not character or character not in characters:
+            raise ValueError('Expected one of %r at %r' % (characters, character))
+        self._pos += 1
+        return character
+
+    def value(self):
+        """
+        Decodes the next value of the document
+        :raise ValueError: if the document is not valid json
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                # the value is not complete yet, it is decoded again
+                # only once the buffer has doubled, so a value that
+                # spans many chunks is not scanned once per chunk
+                if not self._read(len(self._buffer) - self._pos):
+                    raise
+                continue
+            # a number or a literal at the end of the buffer
+            # could continue in the next chunk
+            if end < len(self._buffer) or not self._read():
+                self._pos = end
+                return value
+
+    def enter(self, key):
+        """
+        Moves into the value of key of the next object, skipping
+        the values of the keys that come before it
+        :raise KeyError: if the object has not key
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            raise KeyError(key)
+        while True:
+            name = self.value()
+            self._expect(':')
+            if name == key:
+                return
+            self.value()
+            if self._expect(',}') == '}':
+                raise KeyError(key)
+
+    def keys(self):
+        """
+        Yields the keys of the next object, one at a time. After each
+        key its value must be consumed, e.g. with value() or items()
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def items(self):
+        """
+        Yields the items of the next array, one at a time
+        """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self._expect(',]') == ']':
+                return
+
+
+def iter_array(chunks, *path):
+    """
+    Yields the items of the array found following the keys
+    of path, e.g. ('body',) for {"body": [...]}
+    :param chunks: iterable of bytes of the json document
+    """
+    stream = JsonStream(chunks)
+    for key in path:
+        stream.enter(key)
+    yield from stream.items()
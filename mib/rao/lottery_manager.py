@@ -1,6 +1,7 @@
 import re
 from requests.api import request
 from mib import app
+from mib.rao.backend import Backend
 from flask import abort, redirect, render_template
 from flask import abort, json, jsonify
 from mib.forms.lottery import LotteryForm
@@ -8,19 +9,18 @@ import requests
 
 class LotteryManager:
     LOTTERY_ENDPOINT = app.config['LOTTERY_MS_URL']
-    REQUESTS_TIMEOUT_SECONDS = app.config['REQUESTS_TIMEOUT_SECONDS']
+    backend = Backend('lottery', LOTTERY_ENDPOINT)
 
     @classmethod
     def create_lottery_play(cls,
                     id: int, number: int):
         try:
             url = "%s/lottery" % cls.LOTTERY_ENDPOINT
-            response = requests.post(url,
+            response = cls.backend.post(url,
                                      json={
                                          'id': id,
                                          'lottery_number': number
-                                     },
-                                     timeout=cls.REQUESTS_TIMEOUT_SECONDS
+                                     }
                                      )
             print(response.status_code)
             if response.status_code == 201:
@@ -40,8 +40,7 @@ class LotteryManager:
     def already_exists(cls, id:int):
         try:
             url = "%s/lottery/exist/%s" % (cls.LOTTERY_ENDPOINT, str(id))
-            response = requests.get(url,
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS
+            response = cls.backend.get(url
                                     )
             print(response.status_code)
             if response.status_code == 200:
@@ -1,71 +1,99 @@
 
+from operator import attrgetter, itemgetter
+
+
 class Message():
     """
     It is not a model, it is only a lightweight class used
     to represents a message.
+    The fields are kept in slots, since the messages are built
+    in bulk for each folder.
+    It remembers the fields changed since it was built,
+    so only them can be sent to the messages microservice.
     """
 
-    # All fields of message
-    id = None
-    sender_id = None
-    sender = None
-    receiver_id = -1
-    receiver = None
-    body = None
-    photo = None
-    timestamp = None
-    draft = None
-    scheduled = None
-    sent = 0
-    read = 0
-    bold = None
-    deleted = 0
-    italic = None
-    underline = None
-
-    SERIALIZE_LIST = ['id', 'sender_id', 'receiver_id', 'sender', 'receiver', 'body', 'photo', 'timestamp',\
-             'draft', 'scheduled', 'sent', 'read', 'deleted', 'bold', 'italic',\
-             'underline']
+    # A list of fields to be serialized
+    SERIALIZE_LIST = ('id', 'sender_id', 'receiver_id', 'sender', 'receiver', 'body', 'photo', 'timestamp',
+             'draft', 'scheduled', 'sent', 'read', 'deleted', 'bold', 'italic',
+             'underline')
+
+    # Fields of the messages listed in the folders, without the photo
+    SUMMARY_LIST = tuple(key for key in SERIALIZE_LIST if key != 'photo')
+
+    # Fields of a message built without arguments
+    DEFAULTS = dict(dict.fromkeys(SERIALIZE_LIST), receiver_id = -1, sent = 0, read = 0, deleted = 0)
+
+    __slots__ = SERIALIZE_LIST + ('_dirty',)
 
     @staticmethod
     def build_from_json(json: dict):
-        kw = {key: json[key] for key in Message.SERIALIZE_LIST}
-        return Message(**kw)
+        message = Message.__new__(Message)
+        message._fill(Message.SERIALIZE_LIST, _serialized_values(json))
+        return message
+
+    @staticmethod
+    def build_summary_from_json(json: dict):
+        """
+        Builds a message without the photo, that is retrieved
+        only when the whole message is requested by id.
+        """
+        message = Message.__new__(Message)
+        message._fill(Message.SUMMARY_LIST, _summary_values(json))
+        _setters['photo'](message, None)
+        return message
 
     def serialize(self):
-            return dict([(k, self.__getattribute__(k)) for k in self.SERIALIZE_LIST])        
+        return dict(zip(self.SERIALIZE_LIST, _field_values(self)))
 
     def __init__(self, **kw):
         if kw == {}:
-            return
-        self.id = kw["id"]
-        self.sender_id = kw["sender_id"]
-        self.receiver_id = kw["receiver_id"]
-        self.sender = kw["sender"]
-        self.receiver = kw["receiver"]
-        self.body = kw["body"]
-        self.photo = kw["photo"]
-        self.timestamp = kw["timestamp"]
-        self.draft = kw["draft"]
-        self.scheduled = kw["scheduled"]
-        self.sent = kw["sent"]
-        self.read = kw["read"]
-        self.deleted = kw["deleted"]
-        self.bold = kw["bold"]
-        self.italic = kw["italic"]
-        self.underline = kw["underline"]
+            # an empty message does not track its changes
+            self._fill(self.SERIALIZE_LIST, self.DEFAULTS.values(), dirty = None)
+        else:
+            self._fill(self.SERIALIZE_LIST, _serialized_values(kw))
+
+    def _fill(self, fields, values, dirty = ()):
+        # the slots are set directly, so the fill is not tracked
+        for key, value in zip(fields, values):
+            _setters[key](self, value)
+        _setters['_dirty'](self, dirty)
+
+    def __setattr__(self, name, value):
+        dirty = self._dirty
+        if dirty is not None and name in self.SERIALIZE_LIST and getattr(self, name) != value:
+            if not dirty:
+                # a clean message shares the empty tuple, the set is created on the first change
+                dirty = set()
+                _setters['_dirty'](self, dirty)
+            dirty.add(name)
+        object.__setattr__(self, name, value)
+
+    def clean(self):
+        """
+        Forgets the changed fields, e.g. after they have been saved
+        """
+        _setters['_dirty'](self, ())
+
+    def changes(self):
+        """
+        :return: dict of the fields changed since the message was
+            built or cleaned, all the fields of an empty built message
+        """
+        if self._dirty is None:
+            return self.serialize()
+        return {key: getattr(self, key) for key in self.SERIALIZE_LIST if key in self._dirty}
 
     def get_id(self):
         return self.id
 
-    def __getattr__(self, item):
-        if item in self.__dict__:
-            return self[item]
-        else:
-            raise AttributeError('Attribute %s does not exist' % item)
-
     def __str__(self):
         s = 'Message Object\n'
-        for (key, value) in self.__dict__.items():
+        for (key, value) in self.serialize().items():
             s += "%s=%s\n" % (key, value)
-        return s
\ No newline at end of file
+        return s
+
+
+_serialized_values = itemgetter(*Message.SERIALIZE_LIST)
+_summary_values = itemgetter(*Message.SUMMARY_LIST)
+_field_values = attrgetter(*Message.SERIALIZE_LIST)
+_setters = {key: getattr(Message, key).__set__ for key in Message.__slots__}
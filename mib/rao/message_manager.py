@@ -1,25 +1,46 @@
 from requests.api import get, request
-from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.exceptions import NotFound, ServiceUnavailable
 from mib import app
+from mib.rao.backend import Backend
 from flask import abort, json, jsonify
 from mib.rao.user_manager import UserManager
 from mib.rao.message import Message
+from mib.rao.parallel import parallel_map
+from mib.rao.notification_cache import NotificationCache
+from mib.rao.json_stream import JsonStream, iter_array
 import requests
 
 class MessageManager:
     MESSAGES_ENDPOINT = app.config['MESSAGES_MS_URL']
-    REQUESTS_TIMEOUT_SECONDS = app.config['REQUESTS_TIMEOUT_SECONDS']
+    backend = Backend('messages', MESSAGES_ENDPOINT)
+    SEND_CONCURRENCY = app.config['MESSAGES_SEND_CONCURRENCY']
+    PAGE_SIZE = app.config['MAILBOX_PAGE_SIZE']
+    # asks the microservice to omit the photos in the lists of messages
+    SUMMARY_PARAMS = {'projection': 'summary'}
+    # bytes read at a time from the streamed folders
+    STREAM_CHUNK_SIZE = 64 * 1024
+    # it becomes False if the messages microservice has not the bulk route
+    BULK_CREATE_AVAILABLE = True
+    # it becomes False if the messages microservice has not the bulk update route
+    BULK_UPDATE_AVAILABLE = True
+    # it becomes False if the messages microservice does not accept PATCH
+    PATCH_AVAILABLE = True
+    # result of a creation whose answer has been lost
+    UNKNOWN = object()
 
     @classmethod
     def get_filtered_messages(cls, user_id, user_email, body, sender, date):
         """
         This method contacts the messages microservice
         and search the messages of the user whose id == user_id.
+        The response is streamed and each message is built as soon
+        as it arrives, so neither the json body nor its dicts are held.
         :return: messages that match with one or more parameters
         """
         try:
             url = "%s/search" % (cls.MESSAGES_ENDPOINT)
-            response = requests.post(url,
+            response = cls.backend.post(url,
+                                    params = cls.SUMMARY_PARAMS,
                                     json = {
                                         'user_id': user_id,
                                         'user_email': user_email,
@@ -27,18 +48,35 @@ class MessageManager:
                                         'sender': sender,
                                         'date': date
                                     },
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+                                    stream = True
                                     )
-            json_payload = response.json()
-            if response.status_code == 200:
-                filtered_inbox = [Message.build_from_json(message) for message in json_payload['body']['filtered_inbox']]
-                filtered_sent = [Message.build_from_json(message) for message in json_payload['body']['filtered_sent']]
-                filtered_scheduled = [Message.build_from_json(message) for message in json_payload['body']['filtered_scheduled']]
-            else:
-                raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
-        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            try:
+                if response.status_code == 200:
+                    results = cls._read_search_results(response)
+                else:
+                    raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            finally:
+                response.close()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError):
             return abort(500)
-        return filtered_inbox, filtered_sent, filtered_scheduled
+        return results['filtered_inbox'], results['filtered_sent'], results['filtered_scheduled']
+
+    @classmethod
+    def _read_search_results(cls, response):
+        """
+        :return: dict key -> list of Message obj of each list of the results,
+            the lists are read in the order the microservice sends them
+        """
+        results = {'filtered_inbox': [], 'filtered_sent': [], 'filtered_scheduled': []}
+        stream = JsonStream(response.iter_content(cls.STREAM_CHUNK_SIZE))
+        stream.enter('body')
+        for key in stream.keys():
+            if key in results:
+                results[key] = [Message.build_summary_from_json(message) for message in stream.items()]
+            else:
+                stream.value()
+        return results
 
     @classmethod
     def create_message(cls, message: Message):
@@ -49,19 +87,91 @@ class MessageManager:
         :return: the new message
         """
         try:
-            url = "%s/message" % (cls.MESSAGES_ENDPOINT)
-            response = requests.post(url,
-                                    json = message.serialize(),
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
-                                    )
-            json_payload = response.json()
-            if response.status_code == 201:
-                return Message.build_from_json(json_payload['body'])
-            else:
-                raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            return cls._post_message(message)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
 
+    @classmethod
+    def _post_message(cls, message: Message):
+        """
+        Like create_message, but the errors of the call are raised.
+        """
+        url = "%s/message" % (cls.MESSAGES_ENDPOINT)
+        response = cls.backend.post(url,
+                                json = message.serialize()
+                                )
+        json_payload = response.json()
+        if response.status_code == 201:
+            NotificationCache.invalidate(message.receiver_id)
+            return Message.build_from_json(json_payload['body'])
+        else:
+            raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+
+    @classmethod
+    def create_messages(cls, messages):
+        """
+        This method contacts the messages microservice
+        and creates all the messages with a single request.
+        If the microservice does not expose the bulk route,
+        the messages are created with concurrent requests.
+        A request whose answer is lost (e.g. a read timeout) may have
+        been executed, so its messages are not sent again, that could
+        duplicate them, but they are returned as unknown.
+        :param messages: list of lightweight messages
+        :return: (created, failed, unknown), the list of the new messages,
+            the list of the messages that have not been created and
+            the list of the messages that may have been created
+        """
+        if not messages:
+            return [], [], []
+        if cls.BULK_CREATE_AVAILABLE:
+            try:
+                url = "%s/messages" % (cls.MESSAGES_ENDPOINT)
+                response = cls.backend.post(url,
+                                        json = {
+                                            'messages': [message.serialize() for message in messages]
+                                        }
+                                        )
+                if response.status_code == 201:
+                    NotificationCache.invalidate(*[message.receiver_id for message in messages])
+                    return [Message.build_from_json(message) for message in response.json()['body']], [], []
+                elif response.status_code not in (404, 405):
+                    raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                app.logger.warning('Messages to %s not confirmed: %s' % (
+                    ', '.join(message.receiver for message in messages), e))
+                if cls.backend.was_sent(e):
+                    NotificationCache.invalidate(*[message.receiver_id for message in messages])
+                    return [], [], list(messages)
+                return [], list(messages), []
+            # the messages microservice does not know the bulk route
+            cls.BULK_CREATE_AVAILABLE = False
+
+        results = parallel_map(cls._try_create_message, messages, cls.SEND_CONCURRENCY)
+        created = [result for result in results if isinstance(result, Message)]
+        failed = [message for message, result in zip(messages, results) if result is None]
+        unknown = [message for message, result in zip(messages, results) if result is cls.UNKNOWN]
+        return created, failed, unknown
+
+    @classmethod
+    def _try_create_message(cls, message: Message):
+        """
+        Like create_message, but a failure is returned
+        so that the other messages of the bulk can be created.
+        :return: the new message, None if it has not been created
+            or UNKNOWN if it may have been created
+        """
+        try:
+            return cls._post_message(message)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            app.logger.warning('Message to %s not confirmed: %s' % (message.receiver, e))
+            if cls.backend.was_sent(e):
+                NotificationCache.invalidate(message.receiver_id)
+                return cls.UNKNOWN
+        except (RuntimeError, ValueError) as e:
+            # ValueError: the body of the answer is not json
+            app.logger.warning('Message to %s not created: %s' % (message.receiver, e))
+        return None
 
     @classmethod
     def update_message(cls, message: Message):
@@ -73,18 +183,115 @@ class MessageManager:
         """
         try:
             url = "%s/message/%s" % (cls.MESSAGES_ENDPOINT, str(message.id))
-            response = requests.put(url,
-                                    json = message.serialize(),
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+            response = cls.backend.put(url,
+                                    json = message.serialize()
                                     )
             json_payload = response.json()
             if response.status_code == 200:
+                # the read flags change the notifications of both the users
+                NotificationCache.invalidate(message.sender_id, message.receiver_id)
                 return Message.build_from_json(json_payload['body'])
             else:
                 raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
 
+    @classmethod
+    def acknowledge_read_receipts(cls, message_ids, sender_id):
+        """
+        This method contacts the messages microservice and marks
+        the read receipts of the messages as acknowledged (sent = 2),
+        with a single request carrying only the ids and the flag.
+        If the microservice does not expose the bulk route,
+        the messages are updated with concurrent requests.
+        :param message_ids: the ids of the sent messages read by the receivers
+        :param sender_id: the id of the sender, whose notifications change
+        """
+        message_ids = list(message_ids)
+        if not message_ids:
+            return
+        if cls.BULK_UPDATE_AVAILABLE:
+            try:
+                url = "%s/messages" % (cls.MESSAGES_ENDPOINT)
+                response = cls.backend.patch(url,
+                                        json = {
+                                            'ids': message_ids,
+                                            'sent': 2
+                                        }
+                                        )
+                if response.status_code in (200, 204):
+                    NotificationCache.invalidate(sender_id)
+                    return
+                elif response.status_code not in (404, 405):
+                    raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                return abort(500)
+            # the messages microservice does not know the bulk route
+            cls.BULK_UPDATE_AVAILABLE = False
+
+        parallel_map(cls._acknowledge_read_receipt, message_ids, cls.SEND_CONCURRENCY)
+        NotificationCache.invalidate(sender_id)
+
+    @classmethod
+    def _acknowledge_read_receipt(cls, message_id):
+        try:
+            cls.patch_message(message_id, sent = 2)
+        except NotFound:
+            # the message has been deleted meanwhile
+            pass
+
+    @classmethod
+    def patch_message(cls, message_id, user_ids = (), **fields):
+        """
+        This method contacts the messages microservice and
+        updates only the given fields of the message with id == message_id.
+        If the microservice does not accept PATCH, the whole
+        message is retrieved and updated.
+        :param message_id: the message id
+        :param user_ids: the users whose notifications may change
+        :param fields: the fields to update, e.g. read = 1
+        :return: the edited message
+        :raise NotFound: if the message does not exist
+        """
+        if cls.PATCH_AVAILABLE:
+            try:
+                url = "%s/message/%s" % (cls.MESSAGES_ENDPOINT, str(message_id))
+                response = cls.backend.patch(url,
+                                        json = fields
+                                        )
+                if response.status_code == 200:
+                    NotificationCache.invalidate(*user_ids)
+                    return Message.build_from_json(response.json()['body'])
+                elif response.status_code == 404:
+                    return abort(404)
+                elif response.status_code != 405:
+                    raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                return abort(500)
+            # the messages microservice does not accept PATCH
+            cls.PATCH_AVAILABLE = False
+
+        message = cls.get_message_by_id(message_id)
+        if message is None:
+            return abort(404)
+        for field, value in fields.items():
+            setattr(message, field, value)
+        return cls.update_message(message)
+
+    @classmethod
+    def save_changes(cls, message: Message):
+        """
+        Sends to the messages microservice only the fields
+        of the message changed since it was retrieved.
+        :param message: the message retrieved by id
+        :return: the message
+        """
+        changes = message.changes()
+        if changes:
+            cls.patch_message(message.id, (message.sender_id, message.receiver_id), **changes)
+            message.clean()
+        return message
+
     @classmethod
     def get_message_by_id(cls, message_id: int) -> Message:
         """
@@ -94,8 +301,7 @@ class MessageManager:
         :return: Message obj with id = message_id
         """
         try:
-            response = requests.get("%s/message/%s" % (cls.MESSAGES_ENDPOINT, str(message_id)),
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.get("%s/message/%s" % (cls.MESSAGES_ENDPOINT, str(message_id)))
             json_payload = response.json()
             if response.status_code == 200:
                 return Message.build_from_json(json_payload['body'])
@@ -107,87 +313,144 @@ class MessageManager:
             return abort(500)
 
     @classmethod
-    def get_dir(cls, dir, user_email, user_id):
+    def get_dir(cls, dir, user_email, user_id, page = None):
         """ 
         This method contacts the message microservice and 
-        retrieves the messages in the 'dir' box
+        retrieves the messages in the 'dir' box, without their photos.
+        If page is specified only PAGE_SIZE + 1 messages are
+        retrieved, the last one tells if there is a next page.
+        :param page: the number of the page, starting from 1
         """
+        params = dict(cls.SUMMARY_PARAMS)
+        if page is not None:
+            offset = (page - 1) * cls.PAGE_SIZE
+            params.update({'offset': offset, 'limit': cls.PAGE_SIZE + 1})
         try:
             url = "%s/%s" % (cls.MESSAGES_ENDPOINT, dir)
-            response = requests.get(url,
+            response = cls.backend.get(url,
                                     json = {
                                         'user_id': user_id,
                                         'user_email': user_email
                                     },
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+                                    params = params
                                     )
             json_payload = response.json()
             if response.status_code == 200:
-                return [Message.build_from_json(message) for message in json_payload['body']]
+                messages = json_payload['body']
+                if page is not None and 'offset' not in json_payload:
+                    # the microservice has sent the whole box, so the page is cut here
+                    messages = messages[offset:offset + cls.PAGE_SIZE + 1]
+                return [Message.build_summary_from_json(message) for message in messages]
             else:
                 raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
 
     @classmethod
-    def get_inbox(cls, user_email, user_id):
+    def iter_dir(cls, dir, user_email, user_id):
+        """
+        Like get_dir for the whole box, but the response is streamed
+        and each message is built as soon as it arrives, so the box
+        is never held in memory, neither as json nor as dicts.
+        The request is sent immediately, so the errors of the
+        microservice are raised before the first message.
+        :return: generator of the Message objs in the 'dir' box
+        """
+        try:
+            url = "%s/%s" % (cls.MESSAGES_ENDPOINT, dir)
+            response = cls.backend.get(url,
+                                    json = {
+                                        'user_id': user_id,
+                                        'user_email': user_email
+                                    },
+                                    params = cls.SUMMARY_PARAMS,
+                                    stream = True
+                                    )
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return abort(500)
+        if response.status_code != 200:
+            response.close()
+            raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+        return cls._iter_messages(response, dir)
+
+    @classmethod
+    def _iter_messages(cls, response, dir):
+        try:
+            for message in iter_array(response.iter_content(cls.STREAM_CHUNK_SIZE), 'body'):
+                yield Message.build_summary_from_json(message)
+        except requests.exceptions.RequestException as e:
+            # the response is already being sent, so the box is truncated
+            app.logger.error('The %s box has been truncated: %s' % (dir, e))
+        finally:
+            response.close()
+
+    @classmethod
+    def get_inbox(cls, user_email, user_id, page = None):
         """ 
         This method contacts the message microservice and 
         retrieves the inbox messages
         :param user_id: the user id who requests the inbox messages
+        :param page: the page to retrieve, None for all the messages
         :return: json message containing these messages
         """
-        return MessageManager.get_dir('inbox', user_email, user_id)
+        return MessageManager.get_dir('inbox', user_email, user_id, page)
     
     @classmethod
-    def get_scheduled(cls, user_email, user_id):
+    def get_scheduled(cls, user_email, user_id, page = None):
         """ 
         This method contacts the message microservice and 
         retrieves the scheduled messages
         :param user_id: the user id who requests the scheduled messages
+        :param page: the page to retrieve, None for all the messages
         :return: json message containing these messages
         """
-        return MessageManager.get_dir('scheduled', user_email, user_id)
+        return MessageManager.get_dir('scheduled', user_email, user_id, page)
     
     @classmethod
-    def get_sent(cls, user_email, user_id):
+    def get_sent(cls, user_email, user_id, page = None):
         """ 
         This method contacts the message microservice and 
         retrieves the draft messages
         :param user_id: the user id who requests the sent messages
+        :param page: the page to retrieve, None for all the messages
         :return: json message containing these messages
         """
-        return MessageManager.get_dir('sent', user_email, user_id)
+        return MessageManager.get_dir('sent', user_email, user_id, page)
     
     @classmethod
-    def get_draft(cls, user_email, user_id):
+    def get_draft(cls, user_email, user_id, page = None):
         """ 
         This method contacts the message microservice and 
         retrieves the draft messages
         :param user_id: the user id who requests the messagese
+        :param page: the page to retrieve, None for all the messages
         :return: json message containing these messages
         """
-        return MessageManager.get_dir('draft', user_email, user_id)
+        return MessageManager.get_dir('draft', user_email, user_id, page)
     
     @classmethod
     def get_notifications_number(cls, user_email, user_id):
         """ 
         This method contacts the message microservice and 
-        retrieves the notifications number
+        retrieves the notifications number, unless they are
+        in the redis cache
         :param user_id: the user id who requests the notifications
         :return: json message containing these numbers
         """
+        notifications = NotificationCache.get(user_id)
+        if notifications is not None:
+            return notifications
         try:
             url = "%s/notifications" % (cls.MESSAGES_ENDPOINT)
-            response = requests.get(url,
+            response = cls.backend.get(url,
                                     json = {
                                         'user_email': user_email,
                                         'user_id': user_id
-                                    },
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+                                    }
                                     )
             json_payload = response.json()
             if response.status_code == 200:
+                NotificationCache.set(user_id, json_payload['body'])
                 return json_payload['body']
             else:
                 raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
@@ -195,15 +458,18 @@ class MessageManager:
             return abort(500)
     
     @classmethod
-    def delete_message_by_id(cls, message_id):
+    def delete_message_by_id(cls, message_id, user_ids = ()):
         """
         This method contacts the message microservice
         to delete the account of the user
         :param message_id: the message id
+        :param user_ids: the users whose notifications may change
         """
         try:
             url = "%s/message/%s" % (cls.MESSAGES_ENDPOINT, str(message_id))
-            return requests.delete(url, timeout = cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.delete(url)
+            NotificationCache.invalidate(*user_ids)
+            return response
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
     
\ No newline at end of file
@@ -0,0 +1,56 @@
+from redis.exceptions import RedisError
+from mib import app, redis_client
+from mib.rao import codec
+
+
+class NotificationCache:
+    """
+    It keeps in redis, for a few seconds, the number of
+    notifications of each user, that are requested on each
+    view of the dashboard and of the mailbox.
+    The gateway invalidates them when it modifies a message,
+    the short TTL covers the changes made by the microservice.
+    If redis is not reachable the cache behaves as empty.
+    """
+    KEY = 'notifications:%s'
+    TTL_SECONDS = app.config['NOTIFICATIONS_CACHE_TTL_SECONDS']
+
+    @classmethod
+    def get(cls, user_id):
+        """
+        :param user_id: the user id
+        :return: the cached notifications or None
+        """
+        try:
+            cached = redis_client.get(cls.KEY % user_id)
+        except RedisError as e:
+            app.logger.warning('Notification cache not available: %s' % e)
+            return None
+        return codec.loads(cached) if cached is not None else None
+
+    @classmethod
+    def set(cls, user_id, notifications):
+        """
+        Stores the notifications of the user for TTL_SECONDS.
+        :param user_id: the user id
+        :param notifications: the notifications sent by messages ms
+        """
+        try:
+            redis_client.setex(cls.KEY % user_id, cls.TTL_SECONDS, codec.dumps(notifications))
+        except RedisError as e:
+            app.logger.warning('Notification cache not available: %s' % e)
+
+    @classmethod
+    def invalidate(cls, *user_ids):
+        """
+        Removes the notifications of the users,
+        it must be called each time one of their messages changes.
+        :param user_ids: the ids of the users
+        """
+        keys = [cls.KEY % user_id for user_id in user_ids if user_id is not None]
+        if not keys:
+            return
+        try:
+            redis_client.delete(*keys)
+        except RedisError as e:
+            app.logger.warning('Notification cache not available: %s' % e)
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import copy_current_request_context, has_request_context
+
+
+def parallel_map(function, items, max_workers):
+    """
+    Calls function on each item concurrently, using at most
+    max_workers threads for this call, and returns the results
+    in the same order of items. If one of the calls raises an
+    exception (e.g. abort(500)), it is raised again here.
+    Inside a request each call sees the request context of the
+    caller (current_user, request, the deadline, ...).
+    :param function: the function to call, usually a RAO method
+    :param items: the arguments of the calls
+    :param max_workers: the bound of concurrent calls
+    :return: list of results
+    """
+    items = list(items)
+    if len(items) <= 1 or max_workers <= 1:
+        return [function(item) for item in items]
+    calls = [_bind(function, item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(len(items), max_workers)) as executor:
+        return list(executor.map(lambda call: call(), calls))
+
+
+def gather(*calls):
+    """
+    Issues independent backend calls together, so a view waits
+    for the slowest one instead of the sum of them.
+    e.g. badwords, blacklist = gather(
+            partial(UserManager.get_badwords_by_user_id, id),
+            partial(UserManager.get_blacklist_by_user_id, id))
+    :param calls: the calls without arguments, usually partial RAO methods
+    :return: tuple of results, in the same order of calls
+    """
+    return tuple(parallel_map(lambda call: call(), calls, len(calls)))
+
+
+def _bind(function, item):
+    """
+    :return: the call of function on item, with a copy of the
+        request context if there is one (each thread needs its own copy)
+    """
+    def call():
+        return function(item)
+    if has_request_context():
+        return copy_current_request_context(call)
+    return call
@@ -0,0 +1,62 @@
+from redis import BlockingConnectionPool, StrictRedis
+
+
+class RedisHelpers:
+    """
+    The operations on many keys used by the caches,
+    each one takes a single round trip to redis.
+    """
+
+    def get_many(self, keys):
+        """
+        :param keys: the keys to read, with MGET
+        :return: dict key -> value of the keys found
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        return {key: value for key, value in zip(keys, self.mget(keys)) if value is not None}
+
+    def set_many(self, values, ttl_seconds):
+        """
+        Stores all the values, with a pipeline of SETEX
+        :param values: dict key -> value
+        :param ttl_seconds: the ttl of each key
+        """
+        if not values:
+            return
+        pipe = self.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.setex(key, ttl_seconds, value)
+        pipe.execute()
+
+
+class GatewayRedis(RedisHelpers, StrictRedis):
+    """
+    The redis client of the gateway. Its pool is bounded: when all
+    the connections are in use, a thread waits for one at most
+    for the pool timeout, then the call fails like an unreachable
+    redis, so the caches behave as empty instead of piling up
+    connections. The connections idle for longer than the
+    health check interval are checked with a PING before use.
+    """
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        return cls(connection_pool=BlockingConnectionPool.from_url(url, **kwargs))
+
+
+def in_process_provider():
+    """
+    :return: the provider of the in-process redis used by the tests,
+        that need neither a redis instance nor patching the caches
+    """
+    from mockredis import MockRedis
+
+    class InProcessRedis(RedisHelpers, MockRedis):
+
+        @classmethod
+        def from_url(cls, url, **kwargs):
+            return cls(strict=True)
+
+    return InProcessRedis
@@ -0,0 +1,187 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from mib.auth.user import User
+
+SEPARATORS = re.compile(r'\W+')
+
+
+def tokenize(text):
+    """
+    :return: the lowercase words of text, e.g. mario.rossi@mail.it
+        gives mario, rossi, mail, it
+    """
+    return [token for token in SEPARATORS.split((text or '').lower()) if token]
+
+
+class UserSearchIndex:
+    """
+    It is an in-memory index of the users directory, searched by
+    prefix on the words of first name, last name and email.
+    Each word has the set of the users that contain it, and the
+    words are also kept sorted, so the words starting with a prefix
+    are a contiguous slice found by bisection.
+    A user is found if each word of the search is a prefix of one
+    of their words, e.g. "mar ros" finds Mario Rossi. The words of
+    each user are also joined in a string, where a prefix is
+    checked with a single substring search.
+    The users are kept without the photo.
+    """
+    FIELDS = ('first_name', 'last_name', 'email')
+
+    def __init__(self):
+        self._users = {}
+        self._keys = {}
+        self._texts = {}
+        self._postings = {}
+        self._words = []
+        self._lock = threading.Lock()
+        self._syncing = threading.Lock()
+        self.synced_at = None
+
+    def __len__(self):
+        return len(self._users)
+
+    def age(self):
+        """
+        :return: the seconds since the last sync, None if never synced
+        """
+        if self.synced_at is None:
+            return None
+        return time.monotonic() - self.synced_at
+
+    def search(self, searched_input):
+        """
+        :param searched_input: the words to search
+        :return: the list of User obj found, ordered by id
+        """
+        prefixes = set(tokenize(searched_input))
+        if not prefixes:
+            return []
+        with self._lock:
+            # the users of the most selective prefix are the candidates,
+            # the other prefixes are checked on the words of each candidate
+            best, best_count = None, None
+            for prefix in prefixes:
+                count = self._count(prefix, best_count)
+                if best_count is None or count < best_count:
+                    best, best_count = prefix, count
+            start, end = self._range(best)
+            candidates = set()
+            for word in self._words[start:end]:
+                candidates |= self._postings[word]
+            texts = self._texts
+            for prefix in prefixes - {best}:
+                prefix = ' ' + prefix
+                candidates = [user_id for user_id in candidates if prefix in texts[user_id]]
+            return [self._users[user_id] for user_id in sorted(candidates)]
+
+    def put(self, user):
+        """
+        Adds the user to the index, or updates it
+        :param user: the User obj
+        """
+        with self._lock:
+            self._put(user, self._key(user))
+
+    def remove(self, user_id):
+        """
+        Removes the user with user_id from the index
+        """
+        with self._lock:
+            self._remove(user_id)
+
+    def start_sync(self):
+        """
+        Takes the next sync, so only one thread at a time syncs the index
+        :return: True if the caller must sync the index
+        """
+        return self._syncing.acquire(blocking=False)
+
+    def end_sync(self):
+        self._syncing.release()
+
+    def sync(self, users):
+        """
+        Brings the index in line with the directory, only the users
+        created, modified or deleted since the last sync are updated.
+        :param users: the list of all the User obj
+        """
+        current = {user.id: (user, self._key(user)) for user in users}
+        with self._lock:
+            if not self._users:
+                self._build(current)
+            else:
+                removed = [user_id for user_id in self._users if user_id not in current]
+                for user_id in removed:
+                    self._remove(user_id)
+                for user_id, (user, key) in current.items():
+                    if self._keys.get(user_id) != key:
+                        self._put(user, key)
+            self.synced_at = time.monotonic()
+
+    def _key(self, user):
+        return tuple(getattr(user, field) for field in self.FIELDS)
+
+    def _light(self, user):
+        kw = user.serialize()
+        kw['photo'] = None
+        return User(**kw)
+
+    def _range(self, prefix):
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + '\U0010ffff', start)
+        return start, end
+
+    def _count(self, prefix, limit):
+        """
+        :return: the number of users with a word starting with prefix,
+            the count stops as soon as it is greater than limit
+        """
+        start, end = self._range(prefix)
+        count = 0
+        for word in self._words[start:end]:
+            count += len(self._postings[word])
+            if limit is not None and count > limit:
+                break
+        return count
+
+    def _text(self, key):
+        """
+        :return: the words of the fields as ' word word ...'
+        """
+        return ' ' + ' '.join(set(tokenize(' '.join(value or '' for value in key))))
+
+    def _put(self, user, key):
+        self._remove(user.id)
+        text = self._text(key)
+        self._users[user.id] = self._light(user)
+        self._keys[user.id] = key
+        self._texts[user.id] = text
+        for word in text.split():
+            if word not in self._postings:
+                self._postings[word] = set()
+                insort(self._words, word)
+            self._postings[word].add(user.id)
+
+    def _remove(self, user_id):
+        if self._keys.pop(user_id, None) is None:
+            return
+        del self._users[user_id]
+        for word in self._texts.pop(user_id).split():
+            users = self._postings[word]
+            users.discard(user_id)
+            if not users:
+                del self._postings[word]
+                del self._words[bisect_left(self._words, word)]
+
+    def _build(self, current):
+        for user_id, (user, key) in current.items():
+            text = self._text(key)
+            self._users[user_id] = self._light(user)
+            self._keys[user_id] = key
+            self._texts[user_id] = text
+            for word in text.split():
+                self._postings.setdefault(word, set()).add(user_id)
+        self._words = sorted(self._postings)
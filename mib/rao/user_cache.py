@@ -0,0 +1,86 @@
+from redis.exceptions import RedisError
+from mib import app, redis_client
+from mib.rao import codec
+from mib.auth.user import User
+from mib.auth.session import forget_user
+
+
+class UserCache:
+    """
+    It keeps in redis the users loaded by the login manager,
+    so the identity of the current user is not requested
+    to the users microservice on each page.
+    If redis is not reachable the cache behaves as empty.
+    """
+    KEY = 'user:%s'
+    TTL_SECONDS = app.config['USER_CACHE_TTL_SECONDS']
+
+    @classmethod
+    def get(cls, user_id) -> User:
+        """
+        Retrieves the cached user with id == user_id.
+        :param user_id: the user id
+        :return: User obj or None if it is not cached
+        """
+        try:
+            cached = redis_client.get(cls.KEY % user_id)
+        except RedisError as e:
+            app.logger.warning('User cache not available: %s' % e)
+            return None
+        if cached is None:
+            return None
+        return User.build_from_json(codec.loads(cached))
+
+    @classmethod
+    def set(cls, user: User):
+        """
+        Stores the serialized user for TTL_SECONDS.
+        :param user: the user to cache
+        """
+        payload = codec.dumps(user.serialize())
+        try:
+            redis_client.setex(cls.KEY % user.id, cls.TTL_SECONDS, payload)
+        except RedisError as e:
+            app.logger.warning('User cache not available: %s' % e)
+
+    @classmethod
+    def get_many(cls, user_ids):
+        """
+        Retrieves the cached users with a single MGET.
+        :param user_ids: list of user ids
+        :return: dict user id -> User obj of the cached users
+        """
+        user_ids = list(user_ids)
+        try:
+            cached = redis_client.get_many([cls.KEY % user_id for user_id in user_ids])
+        except RedisError as e:
+            app.logger.warning('User cache not available: %s' % e)
+            return {}
+        return {user_id: User.build_from_json(codec.loads(cached[cls.KEY % user_id]))
+                for user_id in user_ids if cls.KEY % user_id in cached}
+
+    @classmethod
+    def set_many(cls, users):
+        """
+        Stores the serialized users for TTL_SECONDS, with a single pipeline.
+        :param users: the users to cache
+        """
+        payloads = {cls.KEY % user.id: codec.dumps(user.serialize()) for user in users}
+        try:
+            redis_client.set_many(payloads, cls.TTL_SECONDS)
+        except RedisError as e:
+            app.logger.warning('User cache not available: %s' % e)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        """
+        Removes the user with id == user_id from the cache and from
+        the session of the current request, it must be called
+        each time the user is modified.
+        :param user_id: the user id
+        """
+        forget_user(user_id)
+        try:
+            redis_client.delete(cls.KEY % user_id)
+        except RedisError as e:
+            app.logger.warning('User cache not available: %s' % e)
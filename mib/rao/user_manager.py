@@ -2,14 +2,26 @@ from requests.api import request
 from werkzeug.exceptions import ServiceUnavailable
 from mib.auth.user import User
 from mib import app
+from mib.rao.backend import Backend
+from mib.rao.user_cache import UserCache
+from mib.rao.directory_cache import DirectoryCache
+from mib.rao.search_index import UserSearchIndex
+from mib.rao.badwords import BadwordsCache
+from mib.rao.parallel import parallel_map
 from flask_login import (logout_user)
 from flask import abort, jsonify
 import requests
+import threading
 
 
 class UserManager:
     USERS_ENDPOINT = app.config['USERS_MS_URL']
-    REQUESTS_TIMEOUT_SECONDS = app.config['REQUESTS_TIMEOUT_SECONDS']
+    backend = Backend('users', USERS_ENDPOINT)
+    LOOKUP_CONCURRENCY = app.config['USERS_LOOKUP_CONCURRENCY']
+    # it becomes False if the users microservice has not the batch route
+    BATCH_LOOKUP_AVAILABLE = True
+    search_index = UserSearchIndex()
+    SEARCH_INDEX_REFRESH_SECONDS = app.config['SEARCH_INDEX_REFRESH_SECONDS']
     
     @classmethod
     def create(cls, user_id: int, path, body):
@@ -20,11 +32,10 @@ class UserManager:
         """
         try:
             url = "%s/%s/%s" % (cls.USERS_ENDPOINT, path, str(user_id))
-            response = requests.post(url,
+            response = cls.backend.post(url,
                                     json = {
                                         path: body,                  
-                                    },
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS
+                                    }
                                     )
             if response.status_code == 201:
                 json_payload = response.json()
@@ -45,7 +56,7 @@ class UserManager:
             logout_user()
         try:
             url = "%s/%s/%s" % (cls.USERS_ENDPOINT, arg, str(user_id))
-            response = requests.delete(url, timeout=cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.delete(url)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
         return response
@@ -59,11 +70,10 @@ class UserManager:
         """
         try:
             url = "%s/%s/%s" % (cls.USERS_ENDPOINT, path, str(user_id))
-            response = requests.put(url,
+            response = cls.backend.put(url,
                                     json = {
                                         path: body,                    
-                                    },
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS
+                                    }
                                     )
             if response.status_code == 200:
                 json_payload = response.json()
@@ -81,8 +91,7 @@ class UserManager:
         to the searched input
         """ 
         try:
-            response = requests.post("%s/search_users/%s" % (cls.USERS_ENDPOINT, searched_input), 
-                timeout = cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.post("%s/search_users/%s" % (cls.USERS_ENDPOINT, searched_input))
             json_payload = response.json()
             if response.status_code == 200:
                 users = [User.build_from_json(item) for item in json_payload.get('body')]
@@ -92,6 +101,37 @@ class UserManager:
             return abort(500)
         return users    
 
+    @classmethod
+    def find_users(cls, searched_input):
+        """
+        This method searches the users by first name, last name
+        and email in the search index of the gateway, that is
+        synced with the directory every SEARCH_INDEX_REFRESH_SECONDS
+        in background.
+        :param searched_input: the words to search
+        :return: list of User obj, without the photo
+        """
+        age = cls.search_index.age()
+        if age is None:
+            # the first search waits for the directory
+            cls.search_index.sync(cls.get_all_users())
+        elif age > cls.SEARCH_INDEX_REFRESH_SECONDS and cls.search_index.start_sync():
+            threading.Thread(target=cls.sync_search_index, daemon=True).start()
+        return cls.search_index.search(searched_input)
+
+    @classmethod
+    def sync_search_index(cls):
+        """
+        Syncs the search index with the directory, it must be
+        called after UserSearchIndex.start_sync
+        """
+        try:
+            cls.search_index.sync(cls.get_all_users())
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            app.logger.warning('Search index not synced: %s' % e)
+        finally:
+            cls.search_index.end_sync()
+
     @classmethod
     def report(cls, email):
         """
@@ -99,8 +139,7 @@ class UserManager:
         report a user
         """
     
-        response = requests.post("%s/report/%s" % (cls.USERS_ENDPOINT, email), 
-            timeout = cls.REQUESTS_TIMEOUT_SECONDS)
+        response = cls.backend.post("%s/report/%s" % (cls.USERS_ENDPOINT, email))
         #json_payload = response.json()
         if response.status_code == 200:
             return 200
@@ -112,21 +151,51 @@ class UserManager:
 
 
     @classmethod
-    def get_all_users(cls):
+    def get_all_users(cls, fresh=False):
+        """ 
+        This method retrieves all the registered users from the
+        directory cache, the stale directory is refreshed in background.
+        If it is not cached, the user microservice is contacted.
+        :param fresh: True to contact the user microservice anyway,
+            when a fresh read is required
+        :return: list of User obj
+        """
+        cached = None if fresh else DirectoryCache.get()
+        if cached is not None:
+            users, stale = cached
+            if stale and DirectoryCache.start_refresh():
+                threading.Thread(target=cls.refresh_directory, daemon=True).start()
+        else:
+            users = cls.fetch_directory()
+            DirectoryCache.set(users)
+        # Get the dict of users and retrieve each user from json
+        return [User.build_from_json(item) for item in users]
+
+    @classmethod
+    def fetch_directory(cls):
         """ 
         This method contacts the user microservice and 
         retrieves all the registered users
+        :return: the users as sent by the user microservice
         """
-
-        response = requests.get("%s/users" % (cls.USERS_ENDPOINT), timeout=cls.REQUESTS_TIMEOUT_SECONDS)
+        response = cls.backend.get("%s/users" % (cls.USERS_ENDPOINT))
         json_payload = response.json()
-        if response.status_code == 200:
-            # Get the dict of users and retrieve each user from json
-            users = [User.build_from_json(item) for item in json_payload.get('body')]  
-        else:
+        if response.status_code != 200:
             raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
-    
-        return users
+        return json_payload.get('body')
+
+    @classmethod
+    def refresh_directory(cls):
+        """
+        Fetches again the directory, if it fails the stale one is
+        served until the next attempt.
+        """
+        try:
+            DirectoryCache.set(cls.fetch_directory())
+        except (requests.exceptions.RequestException, RuntimeError) as e:
+            app.logger.warning('Directory not refreshed: %s' % e)
+        finally:
+            DirectoryCache.end_refresh()
                 
     @classmethod
     def get_user_by_id(cls, user_id: int) -> User:
@@ -134,20 +203,40 @@ class UserManager:
         This method contacts the users microservice
         and retrieves the user object by user id.
         :param user_id: the user id
-        :return: User obj with id=user_id
+        :return: User obj with id=user_id, None if it does not exist
         """
         try:
-            response = requests.get("%s/user/%s" % (cls.USERS_ENDPOINT, str(user_id)),
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.get("%s/user/%s" % (cls.USERS_ENDPOINT, str(user_id)))
             json_payload = response.json()
             if response.status_code == 200:
                 user = User.build_from_json(json_payload['body'])
+            elif response.status_code == 404:
+                return None
             else:
                 raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
         return user                
 
+    @classmethod
+    def get_users_by_ids(cls, user_ids):
+        """
+        Retrieves the users with the given ids, reading the cached ones
+        with a single MGET and contacting concurrently the users
+        microservice only for the others, that are then cached
+        with a single pipeline.
+        :param user_ids: list of user ids
+        :return: dict user id -> User obj, the deleted users are missing
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        users = UserCache.get_many(user_ids)
+        missing = [user_id for user_id in user_ids if user_id not in users]
+        fetched = parallel_map(cls.get_user_by_id, missing, cls.LOOKUP_CONCURRENCY)
+        fetched = {user_id: user for user_id, user in zip(missing, fetched) if user is not None}
+        UserCache.set_many(fetched.values())
+        users.update(fetched)
+        return users
+
     @classmethod
     def get_badwords_by_user_id(cls, user_id: int):
         """
@@ -157,8 +246,7 @@ class UserManager:
         :return: the list of badwords of the user with user_id
         """
         try:
-            response = requests.get("%s/badwords/%s" % (cls.USERS_ENDPOINT, str(user_id)),
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.get("%s/badwords/%s" % (cls.USERS_ENDPOINT, str(user_id)))
             json_payload = response.json()
             if response.status_code == 200:
                 badwords = json_payload['body']
@@ -168,6 +256,31 @@ class UserManager:
             return abort(500)
         return badwords
 
+    @classmethod
+    def get_badwords_by_user_ids(cls, user_ids):
+        """
+        This method contacts the users microservice concurrently
+        and retrieves the badwords of each user.
+        :param user_ids: list of user ids
+        :return: list of badwords lists, in the same order of user_ids
+        """
+        return parallel_map(cls.get_badwords_by_user_id, user_ids, cls.LOOKUP_CONCURRENCY)
+
+    @classmethod
+    def get_badwords_matchers(cls, user_ids):
+        """
+        Retrieves the compiled badwords of each user, contacting
+        concurrently the users microservice only for the users
+        that are not in the cache.
+        :param user_ids: list of user ids
+        :return: list of BadwordsMatcher, in the same order of user_ids
+        """
+        matchers = {user_id: BadwordsCache.get(user_id) for user_id in user_ids}
+        missing = [user_id for user_id, matcher in matchers.items() if matcher is None]
+        for user_id, badwords in zip(missing, cls.get_badwords_by_user_ids(missing)):
+            matchers[user_id] = BadwordsCache.put(user_id, badwords)
+        return [matchers[user_id] for user_id in user_ids]
+
     @classmethod
     def get_blacklist_by_user_id(cls, user_id: int):
         """
@@ -177,8 +290,7 @@ class UserManager:
         :return: the blacklist for the user with id=user_id
         """
         try:
-            response = requests.get("%s/blacklist/%s" % (cls.USERS_ENDPOINT, str(user_id)),
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.get("%s/blacklist/%s" % (cls.USERS_ENDPOINT, str(user_id)))
             json_payload = response.json()
             if response.status_code == 200:
                 blacklist = [email for email in json_payload.get('body')]
@@ -189,6 +301,16 @@ class UserManager:
             return abort(500)
         return blacklist
 
+    @classmethod
+    def get_blacklists_by_user_ids(cls, user_ids):
+        """
+        This method contacts the users microservice concurrently
+        and retrieves the blacklist of each user.
+        :param user_ids: list of user ids
+        :return: list of blacklists, in the same order of user_ids
+        """
+        return parallel_map(cls.get_blacklist_by_user_id, user_ids, cls.LOOKUP_CONCURRENCY)
+
     @classmethod
     def get_user_by_email(cls, user_email: str):
         """
@@ -198,8 +320,7 @@ class UserManager:
         :return: User obj with email = user_email
         """
         try:
-            response = requests.get("%s/user_email/%s" % (cls.USERS_ENDPOINT, user_email),
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS)
+            response = cls.backend.get("%s/user_email/%s" % (cls.USERS_ENDPOINT, user_email))
             json_payload = response.json()
             if response.status_code == 200:
                 return User.build_from_json(json_payload['body'])
@@ -209,6 +330,54 @@ class UserManager:
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
 
+    @classmethod
+    def get_users_by_emails(cls, user_emails):
+        """
+        This method contacts the users microservice
+        and retrieves the users with one of the given emails
+        in a single round-trip. If the microservice does not
+        expose the batch route, the users are looked up concurrently.
+        :param user_emails: list of emails
+        :return: dict email -> User obj, unregistered emails are missing
+        """
+        emails = list(dict.fromkeys(user_emails))
+        if not emails:
+            return {}
+        if cls.BATCH_LOOKUP_AVAILABLE:
+            try:
+                response = cls.backend.post("%s/users/emails" % cls.USERS_ENDPOINT,
+                                            json = {'emails': emails})
+                if response.status_code == 200:
+                    users = [User.build_from_json(item) for item in response.json()['body']]
+                    return {user.email: user for user in users}
+                elif response.status_code not in (404, 405):
+                    raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                return abort(500)
+            # the users microservice does not know the batch route
+            cls.BATCH_LOOKUP_AVAILABLE = False
+
+        users = parallel_map(cls.find_user_by_email, emails, cls.LOOKUP_CONCURRENCY)
+        return {email: user for email, user in zip(emails, users) if user is not None}
+
+    @classmethod
+    def find_user_by_email(cls, user_email: str):
+        """
+        Like get_user_by_email, but an unregistered email is not an error.
+        :param user_email: the user email
+        :return: User obj with email = user_email or None
+        """
+        try:
+            response = cls.backend.get("%s/user_email/%s" % (cls.USERS_ENDPOINT, user_email))
+            if response.status_code == 200:
+                return User.build_from_json(response.json()['body'])
+            elif response.status_code == 404:
+                return None
+            else:
+                raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            return abort(500)
+
     @classmethod
     def create_user(cls,
                     email: str, password: str,
@@ -227,7 +396,7 @@ class UserManager:
         """
         try:
             url = "%s/user" % cls.USERS_ENDPOINT
-            response = requests.post(url,
+            response = cls.backend.post(url,
                                     json = {
                                         'email': email,
                                         'password': password,
@@ -235,11 +404,12 @@ class UserManager:
                                         'lastname': lastname,
                                         'birthdate': birthdate,
                                         'photo': photo,
-                                    },
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+                                    }
                                     )
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
             return abort(500)
+        if response.status_code == 201:
+            DirectoryCache.invalidate()
         return response
 
     @classmethod
@@ -259,7 +429,7 @@ class UserManager:
         """
         try:
             url = "%s/user/%s" % (cls.USERS_ENDPOINT, str(user_id))
-            response = requests.put(url,
+            response = cls.backend.put(url,
                                     json = {
                                         'email': email,
                                         'password': password,
@@ -267,12 +437,15 @@ class UserManager:
                                         'lastname': lastname,
                                         'birthdate': birthdate,
                                         'photo': photo,
-                                    },
-                                    timeout=cls.REQUESTS_TIMEOUT_SECONDS
+                                    }
                                     )
             if response.status_code == 200:
+                UserCache.invalidate(user_id)
+                DirectoryCache.invalidate()
                 json_payload = response.json()
-                return User.build_from_json(json_payload['body'])
+                user = User.build_from_json(json_payload['body'])
+                cls.search_index.put(user)
+                return user
             else:
                 raise RuntimeError('Server has sent an unrecognized status code %s' % response.status_code)
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
@@ -285,7 +458,9 @@ class UserManager:
         to allow the user with user_id to update his points
         :return: points updated
         """
-        return UserManager.update('user/updatepoints', user_id, points)
+        points = UserManager.update('user/updatepoints', user_id, points)
+        UserCache.invalidate(user_id)
+        return points
 
     @classmethod
     def create_badwords(cls, user_id: int, badwords):
@@ -294,7 +469,9 @@ class UserManager:
         to allow the user with user_id to create his badwords list
         :return: Badwords list created
         """
-        return UserManager.create(user_id, 'badwords', badwords)
+        badwords = UserManager.create(user_id, 'badwords', badwords)
+        BadwordsCache.invalidate(user_id)
+        return badwords
 
     @classmethod
     def update_badwords(cls, user_id: int, badwords):
@@ -303,7 +480,9 @@ class UserManager:
         to allow the user with user_id to update his badwords list
         :return: Badwords list updated
         """
-        return UserManager.update('badwords', user_id, badwords)
+        badwords = UserManager.update('badwords', user_id, badwords)
+        BadwordsCache.invalidate(user_id)
+        return badwords
     
     @classmethod
     def delete_badwords(cls, user_id: int):
@@ -313,7 +492,9 @@ class UserManager:
         :param user_id: the user id
         :return: result of the operation
         """
-        return UserManager.delete('badwords', user_id)
+        response = UserManager.delete('badwords', user_id)
+        BadwordsCache.invalidate(user_id)
+        return response
     
     @classmethod
     def create_blacklist(cls, user_id: int, blacklist):
@@ -351,7 +532,11 @@ class UserManager:
         :param user_id: the user id
         :return: the result of the operation
         """
-        return UserManager.delete('user', user_id)
+        response = UserManager.delete('user', user_id)
+        UserCache.invalidate(user_id)
+        DirectoryCache.invalidate()
+        cls.search_index.remove(user_id)
+        return response
 
     @classmethod
     def authenticate_user(cls, email: str, password: str):
@@ -363,9 +548,8 @@ class UserManager:
         """
         payload = dict(email = email, password = password)
         try:
-            response = requests.post('%s/authenticate' % cls.USERS_ENDPOINT,
-                                    json = payload,
-                                    timeout = cls.REQUESTS_TIMEOUT_SECONDS
+            response = cls.backend.post('%s/authenticate' % cls.USERS_ENDPOINT,
+                                    json = payload
                                     )
             json_response = response.json()
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
@@ -379,6 +563,8 @@ class UserManager:
             return None, 403
         elif response.status_code == 200:
             user = User.build_from_json(json_response['body'])
+            # the user is going to be loaded on the next requests
+            UserCache.set(user)
             return user, 200
         elif response.status_code == 400:
             return None, 400
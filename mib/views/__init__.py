@@ -4,7 +4,8 @@ from .users import users
 from .mailbox import mailbox
 from .message import message
 from .lottery import lottery
+from .media import media
 
 """List of the views to be visible through the project
 """
-blueprints = [home, auth, users, mailbox, message, lottery]
+blueprints = [home, auth, users, mailbox, message, lottery, media]
@@ -3,6 +3,7 @@ from requests.api import request
 from flask_login import login_required, login_user, logout_user, current_user
 from mib.forms import LoginForm
 from mib.rao.user_manager import UserManager
+from mib.auth.session import forget_user, regenerate_session, remember_user
 
 auth = Blueprint('auth', __name__)
 
@@ -26,8 +27,10 @@ def login():
             return render_template('login.html', form = form, 
                 user_blocked = "You are blocked, you can't login anymore.")
         elif user and code == 200:
-            # valid user
+            # valid user, the session gets a new id
+            regenerate_session()
             login_user(user)
+            remember_user(user)
             return redirect('/')
         elif code == 404:
             # Not exists 
@@ -48,6 +51,7 @@ def logout():
         Redirects the view to the login page
     """
     print('slogggato')
+    forget_user(current_user.id)
     logout_user()
     return redirect('/login')
 
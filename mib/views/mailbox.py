@@ -5,6 +5,8 @@ from mib.rao.message_manager import MessageManager
 from mib.rao.user_manager import UserManager
 from datetime import datetime, time
 from mib.views.message import edit_message, fill_message_form_from_message
+from mib.views.media import message_photo_url
+from mib.views.utils import stream_template
 
 mailbox = Blueprint('mailbox', __name__)
 
@@ -53,10 +55,13 @@ def draft(id):
 
     # check if the request is to see all messages...
     if (id == ''):
-        draft = MessageManager.get_draft(current_user.email, current_user.id)
-        return render_template("mailbox/messages_list_.html", 
+        page = get_page()
+        draft, has_next = get_folder('draft', page)
+        return render_folder(
         page_title = 'Draft', 
-        messages = draft)
+        messages = draft,
+        page = page,
+        has_next = has_next)
     # ... or if a fixed message is selected by id
     message = MessageManager.get_message_by_id(id)
     if message.sender == current_user.email:
@@ -78,19 +83,19 @@ def sent(id):
     # check if the request is to see all messages...
     if (id == ''):
         # get the sent messages
-        sent = MessageManager.get_sent(current_user.email, current_user.id)
-        # get the read message by the receiver to display the notifications
-        read_by_receiver = []
-        for message in sent:
-            if message.read != 0 and message.sent == 1:
-                # to avoid display again the notification
-                message.sent = 2
-                MessageManager.update_message(message)
-                read_by_receiver.append(message)
-        return render_template("mailbox/messages_list_.html", 
+        page = get_page()
+        sent, has_next = get_folder('sent', page)
+        if page is None:
+            read_by_receiver = set()
+            sent = acknowledge_while_streaming(sent, read_by_receiver)
+        else:
+            read_by_receiver = acknowledge_folder(sent)
+        return render_folder(
             page_title = 'Sent', 
             messages = sent,
-            read_msg = read_by_receiver) 
+            read_msg = read_by_receiver,
+            page = page,
+            has_next = has_next) 
     # ... or if a fixed message is selected by id
     return render_message_by_id(id)
     
@@ -105,16 +110,19 @@ def scheduled(id):
     # check if user wants to delete message and check if the user has points to do this
     if (request.form.__contains__('delete') and current_user.points >= 150):
         message_id = request.form['delete']
-        MessageManager.delete_message_by_id(message_id)
+        MessageManager.delete_message_by_id(message_id, (current_user.id,))
         current_user.points -= 150
         UserManager.update_points(current_user.id, 'decrease')
     # check if the request is to see all messages...
     if (id == ''):
-        scheduled = MessageManager.get_scheduled(current_user.email, current_user.id)
-        return render_template("mailbox/messages_list_.html", 
+        page = get_page()
+        scheduled, has_next = get_folder('scheduled', page)
+        return render_folder(
             page_title = 'Scheduled', 
             messages = scheduled,
-            points = current_user.points) 
+            points = current_user.points,
+            page = page,
+            has_next = has_next) 
     # ... or if a fixed message is selected by id
     return render_message_by_id(id) 
 
@@ -131,27 +139,104 @@ def inbox(id):
     # check if the request is to see all messages...
     if (id == ''):
         # contacts the messages ms
-        inbox = MessageManager.get_inbox(current_user.email, current_user.id)
-        return render_template("mailbox/messages_list_.html", 
+        page = get_page()
+        inbox, has_next = get_folder('inbox', page)
+        return render_folder(
             page_title = 'Inbox', 
-            messages = inbox) 
+            messages = inbox,
+            page = page,
+            has_next = has_next) 
     # ... or if a fixed message is selected by id
     message = MessageManager.get_message_by_id(id)
     if not message or message.receiver != current_user.email:
         return redirect('/mailbox')
     # set the flag read to 1, because the user is reading the message
     message.read = 1
-    MessageManager.update_message(message)
+    MessageManager.save_changes(message)
     # launch template to read the sent message
     form = fill_message_form_from_message(message)
     form.receiver.label = 'From'
     return render_template("message.html", 
-        mphoto = 'data:image/jpeg;base64,' + message.photo if message.photo != '' else None,
+        mphoto = message_photo_url(message),
         message = message,
         disabled = True, 
         form = form)
 
 # ------- AUXILIARY FUNCTIONS -------
+def get_page():
+    """
+    Returns the page of the folder requested with ?page=,
+    the first page is 1, or None if the folders are not paginated
+    """
+    if not MessageManager.PAGE_SIZE:
+        return None
+    return max(request.args.get('page', 1, type = int), 1)
+
+def get_folder(dir, page):
+    """
+    Retrieves the messages of the 'dir' folder of the user. The messages
+    ms is contacted before the page is streamed, so its errors keep
+    their status code instead of truncating the page.
+    :param page: the page to retrieve, None for the whole folder
+    :return: the messages of the page and True if there is a next page,
+        for the whole folder a generator of its messages, read from the
+        messages ms while the page is streamed, and False
+    """
+    if page is None:
+        return MessageManager.iter_dir(dir, current_user.email, current_user.id), False
+    return paginate(MessageManager.get_dir(dir, current_user.email, current_user.id, page))
+
+def render_folder(**context):
+    """
+    Streams the messages list of a folder, for the whole folders the shell
+    of the page is sent while the messages arrive from the messages ms
+    """
+    return stream_template("mailbox/messages_list_.html", **context)
+
+def acknowledge_folder(messages):
+    """
+    Acknowledges the read receipts of all the sent messages, also the
+    ones out of the page, with a single request. The whole folder
+    is read only if the notifications tell there are receipts to
+    acknowledge, its messages are streamed without their photos
+    :param messages: the messages of the page
+    :return: the ids of the messages of the page read by the receiver
+    """
+    # get the read message by the receiver to display the notifications
+    read_by_receiver = {message.id for message in messages if message.read != 0 and message.sent == 1}
+    notifications = MessageManager.get_notifications_number(current_user.email, current_user.id)
+    if notifications['sent']:
+        # the other pages can have read receipts too
+        folder = MessageManager.iter_dir('sent', current_user.email, current_user.id)
+        for _ in acknowledge_while_streaming(folder, read_by_receiver):
+            pass
+    else:
+        MessageManager.acknowledge_read_receipts(list(read_by_receiver), current_user.id)
+    for message in messages:
+        if message.id in read_by_receiver:
+            message.sent = 2
+    return [message.id for message in messages if message.id in read_by_receiver]
+
+def acknowledge_while_streaming(messages, read_by_receiver):
+    """
+    Yields the streamed sent messages, collecting the ids of the ones
+    read by the receiver, that are acknowledged together at the end
+    :param read_by_receiver: the set filled with the ids
+    """
+    for message in messages:
+        if message.read != 0 and message.sent == 1:
+            read_by_receiver.add(message.id)
+            message.sent = 2
+        yield message
+    MessageManager.acknowledge_read_receipts(list(read_by_receiver), current_user.id)
+
+def paginate(messages):
+    """
+    Removes the extra message retrieved to know if there is a next page
+    :return: the messages of the page and True if there is a next page
+    """
+    return messages[:MessageManager.PAGE_SIZE], len(messages) > MessageManager.PAGE_SIZE
+
 def check_delete_message():
     """
     Check if user wants to delete a message, 
@@ -163,12 +248,12 @@ def check_delete_message():
         # One of the two user interested in message has already deleted the message
         # in his folder, so the message can be definitely deleted from db
         if message.deleted != 0:
-            MessageManager.delete_message_by_id(message_id)
+            MessageManager.delete_message_by_id(message_id, (message.sender_id, message.receiver_id))
             return
         # else the flag deleted is set to 1 or 2 in order to hide the message
         # in the folder for the user who has deleted it
         message.deleted = 2 if current_user.id == message.sender_id else 1
-        MessageManager.update_message(message)
+        MessageManager.save_changes(message)
 
 def render_message_by_id(id):
     """
@@ -182,5 +267,5 @@ def render_message_by_id(id):
     return render_template("message.html", 
         message = message,
         disabled = True,
-        mphoto = 'data:image/jpeg;base64,' + message.photo if message.photo != '' else None,
+        mphoto = message_photo_url(message),
         form = form)
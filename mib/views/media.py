@@ -0,0 +1,99 @@
+import hashlib
+from base64 import b64decode
+from flask import Blueprint, Response, abort, current_app, request, url_for
+from flask_login import current_user, login_required
+from mib.rao.message_manager import MessageManager
+from mib.rao.user_manager import UserManager
+
+media = Blueprint('media', __name__)
+
+# the message photos are stored without the data uri header
+MESSAGE_PHOTO_MIMETYPE = 'image/jpeg'
+
+# ------- ROUTES -------
+@media.route('/media/message/<int:id>')
+@login_required
+def message_photo(id):
+    """
+    Returns the photo attached to the message with id = id,
+    only to its sender or to its receiver
+    """
+    message = MessageManager.get_message_by_id(id)
+    if not message or not message.photo or \
+            current_user.email not in (message.sender, message.receiver):
+        abort(404)
+    return photo_response(message.photo)
+
+
+@media.route('/media/user/<int:id>/photo')
+@login_required
+def user_photo(id):
+    """
+    Returns the profile photo of the user with id = id
+    """
+    user = get_user_with_photo(id)
+    if user is None or not user.photo:
+        abort(404)
+    return photo_response(user.photo)
+
+# ------- AUXILIARY FUNCTIONS -------
+def get_user_with_photo(id):
+    """
+    Returns the user with id = id with its photo, that the logged
+    user kept in the session has not, or None if it does not exist
+    """
+    return UserManager.get_users_by_ids([id]).get(id)
+
+
+def photo_version(photo):
+    """
+    Returns a short hash of the base64 photo, used both as
+    ETag and as version in the url of the photo
+    """
+    return hashlib.sha1(photo.encode('utf-8')).hexdigest()[:16]
+
+
+def message_photo_url(message):
+    """
+    Returns the url of the photo of the message or None
+    """
+    if not message or not message.photo:
+        return None
+    return url_for('media.message_photo', id = message.id, v = photo_version(message.photo))
+
+
+def user_photo_url(user):
+    """
+    Returns the url of the profile photo of the user or None
+    """
+    if not user.photo:
+        return None
+    return url_for('media.user_photo', id = user.id, v = photo_version(user.photo))
+
+
+def photo_response(photo):
+    """
+    Builds the response with the decoded photo. The photo can be
+    a data uri (profile photos) or only its base64 data (messages).
+    If the url contains the version, the browser can keep it
+    until the max age, otherwise it is revalidated with the ETag.
+    The photos are served only to logged users, so they are
+    kept only by the browser, never by the shared caches.
+    """
+    etag = photo_version(photo)
+    if photo.startswith('data:'):
+        header, _, data = photo.partition(',')
+        mimetype = header[len('data:'):].split(';')[0]
+    else:
+        data, mimetype = photo, MESSAGE_PHOTO_MIMETYPE
+    if request.if_none_match.contains(etag):
+        response = Response(status = 304)
+    else:
+        response = Response(b64decode(data), mimetype = mimetype)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    if 'v' in request.args:
+        response.cache_control.max_age = current_app.config['MEDIA_CACHE_MAX_AGE']
+    else:
+        response.cache_control.no_cache = True
+    return response
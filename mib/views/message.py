@@ -1,12 +1,13 @@
-from flask import Blueprint, redirect, render_template
+from flask import Blueprint, current_app, flash, redirect, render_template
 from flask.globals import request
 from flask_login import current_user, login_required
-import re
 #from mib.database import User, db, Message, Messages
 from mib.forms.message import MessageForm
 from mib.rao.message_manager import MessageManager
 from mib.rao.user_manager import UserManager
 from mib.rao.message import Message
+from mib.rao.badwords import MessageBody
+from mib.views.media import message_photo_url
 from datetime import datetime, time
 from base64 import b64encode
 
@@ -20,6 +21,10 @@ FORBIDDEN_WORDS = 'Forbidden words for '
 SCHEDULED = 'Scheduled!'
 DATE_ERROR = 'Date format DD/MM/YYYY hh:mm'
 DRAFT = 'Draft!'
+NOT_SENT = 'The message has not been sent, try again later.'
+SENT_TO = 'The message has been sent to '
+NOT_SENT_TO = 'The message has not been sent to '
+UNKNOWN_TO = 'Check the sent messages before sending it again to '
 
 # ------ ROUTES -------
 @message.route('/mailbox/forward/<id>', methods=['POST', 'GET'])
@@ -65,8 +70,7 @@ def edit_message(receiver, msg = None):
         return render_template("message.html",
             message = msg if msg else None,
             # pass the photo if it exists
-            mphoto = 'data:image/jpeg;base64,' 
-                + msg.photo if msg and msg.photo != '' else None, 
+            mphoto = message_photo_url(msg), 
             form = form, suggest = suggest)
     else:
         # build the message
@@ -100,6 +104,13 @@ def edit_message(receiver, msg = None):
                         message = message,
                         error = CHANGE_BODY, 
                         form = form)
+                # the messages microservice has not created any message
+                if code == NOT_SENT:
+                    return render_template("message.html", 
+                        mphoto = photo if msg else None,
+                        message = message,
+                        error = NOT_SENT, 
+                        form = form)
                 # forbidden words for some dest
                 if code == FORBIDDEN_WORDS:
                     return render_template("message.html", 
@@ -146,51 +157,53 @@ def validate_message(message):
     # get the recipients list 
     recipients_list = recipients.split(", ")
     len_lis = len(recipients_list)
+    # resolve all the recipients with a single request to the users ms
+    recipients_users = UserManager.get_users_by_emails(recipients_list)
     # check if the recipients are registered
-    not_registered = check_dests(recipients_list)
+    not_registered = check_dests(recipients_list, recipients_users)
     if not_registered != "":
         return (USER_INEXISTENT, not_registered)
     # check if the sender is in one of the recipient's blacklist 
-    blacklist = check_blacklist(recipients_list)
+    blacklist = check_blacklist(recipients_list, recipients_users)
     if blacklist != "":
         return (BLACKLIST, blacklist)
     # check for each recipient if there is someone that doesn't accept one
-    # of the words in the body
+    # of the words in the body, the badwords are requested concurrently
     removed_dst = ''
-    for email in recipients_list:
-        if check_words(message, email):
+    matchers = UserManager.get_badwords_matchers(
+        [get_recipient(email, recipients_users).id for email in recipients_list])
+    # the body is scanned only once for each distinct list of badwords
+    body = MessageBody(message.body)
+    for email, matcher in zip(recipients_list, matchers):
+        if check_words(message, email, recipients_users, matcher, body):
             if removed_dst == '':
                 removed_dst = email
             else:
                 removed_dst = removed_dst + ", " + email
         else:
             updated_list.append(email)
-    return result_send(updated_list, len_lis, message, removed_dst)
+    return result_send(updated_list, len_lis, message, removed_dst, recipients_users)
 
-def check_words(message, rec):
+def check_words(message, rec, recipients_users = None, matcher = None, body = None):
     """
     Check message body to avoid badwords for a particular receiver
     """
-    receiver = UserManager.get_user_by_email(rec)
+    receiver = get_recipient(rec, recipients_users)
     message.receiver_id = receiver.id
-    badwords = UserManager.get_badwords_by_user_id(receiver.id)
-    """if badwords == []:
-        return False"""
-    # deletes comma, dot, etc..
-    cleaned_body = re.split('\W', message.body)
-    for word in badwords:
-        if word in cleaned_body:
-            return True
-    return False
+    if matcher is None:
+        matcher = UserManager.get_badwords_matchers([receiver.id])[0]
+    if body is None:
+        body = MessageBody(message.body)
+    return body.contains(matcher)
 
 
 # Check if all the recipients of the message are registered
-def check_dests(recipients_list):
+def check_dests(recipients_list, recipients_users = None):
     unregistered = ""
-    # contact user ms
-    users = UserManager.get_all_users()
-    # get a list of all registered users
-    registered_users = [user.email for user in users]
+    # contact user ms only for the recipients, not for all the users
+    if recipients_users is None:
+        recipients_users = UserManager.get_users_by_emails(recipients_list)
+    registered_users = recipients_users.keys()
     # for each recipient, check if it is in the list of registered user
     #return [user for user in recipients_list if user not in registered_users]
     for user in recipients_list:
@@ -220,12 +233,13 @@ def check_deleted(recipients_list):
     return deleted"""
 
 # Check if the sender is in one of the recipient's blacklist
-def check_blacklist(recipients_list):
+def check_blacklist(recipients_list, recipients_users = None):
     blacklisted_by = ""
-    # for each recipient get the black list and ensure the sender is not present
-    for email in recipients_list:
-        user = UserManager.get_user_by_email(email)
-        blacklist = UserManager.get_blacklist_by_user_id(user.id)
+    # get the black lists of all the recipients concurrently
+    blacklists = UserManager.get_blacklists_by_user_ids(
+        [get_recipient(email, recipients_users).id for email in recipients_list])
+    # for each recipient ensure the sender is not present in the black list
+    for email, blacklist in zip(recipients_list, blacklists):
         # if the sender is in the recipient "item" blacklist, return the recipient
         if current_user.email in blacklist:
             if blacklisted_by == "":
@@ -237,12 +251,13 @@ def check_blacklist(recipients_list):
 
 # Auxiliary fuction to check if the message can be sent 
 # or there are some problems, content or recipients related
-def result_send(updated_list, len_lis, message, removed_dst):
+def result_send(updated_list, len_lis, message, removed_dst, recipients_users = None):
     # now the recipients list is updated
     # if there are no words forbidden for any recipient in the list
     # the message can be scheduled
     if len(updated_list) == len_lis:
-        send_message(message)
+        if not send_message(message, recipients_users):
+            return (NOT_SENT, [])
         return (SCHEDULED, [])
     # else someone of the recipients has been removed
     else:
@@ -253,9 +268,10 @@ def result_send(updated_list, len_lis, message, removed_dst):
         # else, the recipients list is not empty, so the message will be sent 
         # to the recipients who accept the body of the message
         else:
-            updated_dest = ''.join(updated_list)
+            updated_dest = ', '.join(updated_list)
             message.receiver = updated_dest
-            send_message(message)
+            if not send_message(message, recipients_users):
+                return (NOT_SENT, [])
             return (FORBIDDEN_WORDS, removed_dst)
 
 
@@ -279,16 +295,46 @@ def draft_remove(message: Message):
     message.scheduled = True
     MessageManager.update_message(message)"""
 
-def send_message(message: Message):
+def send_message(message: Message, recipients_users = None):
     """
-    Send a message when user tap the save button
+    Send a message when user tap the save button.
+    If it is not sent to some recipients, the user is told
+    to which ones it has been sent and to which ones not
+    :return: False if the message has not been sent to anyone
     """
-    # iterate on string receiver
+    # build a copy of the message for each receiver
     receiver_emails = message.receiver.split(', ')
+    messages = []
     for receiver_email in receiver_emails:
-        message.receiver = receiver_email
-        message.receiver_id = UserManager.get_user_by_email(receiver_email).id
-        MessageManager.create_message(message)
+        copy = Message(**message.serialize())
+        copy.receiver = receiver_email
+        copy.receiver_id = get_recipient(receiver_email, recipients_users).id
+        messages.append(copy)
+    # and create all of them at once
+    created, failed, unknown = MessageManager.create_messages(messages)
+    if failed or unknown:
+        current_app.logger.error('Message sent to %s but not to %s (unknown for %s)' % (
+            ', '.join(m.receiver for m in created),
+            ', '.join(m.receiver for m in failed),
+            ', '.join(m.receiver for m in unknown)))
+        if not created and not unknown:
+            return False
+        if created:
+            flash(SENT_TO + ', '.join(m.receiver for m in created))
+        if failed:
+            flash(NOT_SENT_TO + ', '.join(m.receiver for m in failed))
+        if unknown:
+            flash(UNKNOWN_TO + ', '.join(m.receiver for m in unknown))
+    return True
+
+def get_recipient(email, recipients_users = None):
+    """
+    Returns the user with the given email, using the recipients
+    already resolved for this message when they are available
+    """
+    if recipients_users is not None and email in recipients_users:
+        return recipients_users[email]
+    return UserManager.get_user_by_email(email)
 
 # build a new message if msg is None, else edit msg 
 # (build a new message with same id of msg)
@@ -3,9 +3,13 @@ from flask_wtf.form import FlaskForm
 from flask_login import login_required, current_user
 from mib.forms.user import UserForm, ReportForm
 from mib.rao.user_manager import UserManager
+from mib.rao.parallel import gather
 from mib.auth.user import DEFAULT_PIC, User
+from mib.views.media import user_photo_url
+from mib.views.utils import stream_template
 from base64 import b64encode
 from datetime import datetime
+from functools import partial
 
 users = Blueprint('users', __name__)
 
@@ -14,7 +18,7 @@ users = Blueprint('users', __name__)
 # Return filtered users
 # List all searched users by name, surname or email
 def search_users(searched_input):
-    response = UserManager.search_users(searched_input)
+    response = UserManager.find_users(searched_input)
     return response
 
 # List all users to choose a recipient for a message
@@ -25,17 +29,20 @@ def get_users():
     Returns:
         All users registered to service.
     """
-    response = UserManager.get_all_users()
     searched_input = request.args.get("search")
+    # the users are retrieved before the page is streamed,
+    # so the errors of the users ms keep their status code
     if searched_input:
         # filter and show the list
         users = search_users(searched_input)
-        return render_template("users.html", users = users, 
+        return stream_template("users.html", users = users, 
                                current_user = current_user, 
                                searched_input = "You searched: " + searched_input)
     else:
-        # get all users list
-        return render_template("users.html", users = response, 
+        # get all users list, a reload of the page
+        # without the browser cache asks for a fresh list
+        fresh = bool(request.cache_control.no_cache)
+        return stream_template("users.html", users = UserManager.get_all_users(fresh), 
                                current_user = current_user)
 
 # Report a user
@@ -163,19 +170,18 @@ def edit_profile():
     # the email is not editable 
     # so manual fill this field to avoid error on submit
     form.email.data = current_user.email
-    badwords = UserManager.get_badwords_by_user_id(current_user.id)
-    blacklist = UserManager.get_blacklist_by_user_id(current_user.id)
     if form.validate_on_submit():
         # update user info
         _, password, firstname, lastname, \
         birthdate, photo, badwords, blacklist = get_form_fields(form)
         birthdate =  birthdate.strftime('%d/%m/%Y')
-        updated_user = UserManager.update_user(
-            current_user.email, current_user.id, password, firstname,
-            lastname, birthdate, photo
+        # the three updates are independent, so they are sent together
+        updated_user, updated_badwords, updated_blacklist = gather(
+            partial(UserManager.update_user, current_user.email, current_user.id,
+                password, firstname, lastname, birthdate, photo),
+            partial(UserManager.update_badwords, current_user.id, badwords.split(', ')),
+            partial(UserManager.update_blacklist, current_user.id, blacklist.split(', '))
         )
-        updated_badwords = UserManager.update_badwords(current_user.id, badwords.split(', '))
-        updated_blacklist = UserManager.update_blacklist(current_user.id, blacklist.split(', '))
         # update current user
         current_user.photo = updated_user.photo
         current_user.first_name = updated_user.first_name
@@ -184,14 +190,15 @@ def edit_profile():
         # user = UserManager.get_user_by_id(current_user.id)
         # display a message advising correct info update
         return render_template("profile.html", 
-            mphoto = current_user.photo,
+            mphoto = user_photo_url(current_user),
             form = fill_form_with_user(current_user, updated_badwords, updated_blacklist), 
             just_edited = "Personal info updated. Return to ")
     # some error
     else:
+        badwords, blacklist = get_badwords_and_blacklist(current_user.id)
         for field, error in form.errors.items():
             return render_template("profile.html",
-                mphoto = current_user.photo,
+                mphoto = profile_photo_url(),
                 form = fill_form_with_user(current_user, badwords, blacklist), 
                 date_error_message =  field + ': ' + error[0])
 
@@ -199,15 +206,32 @@ def show_profile():
     """
     Open a page with user infos
     """
-    badwords = UserManager.get_badwords_by_user_id(current_user.id)
-    blacklist = UserManager.get_blacklist_by_user_id(current_user.id)
+    badwords, blacklist = get_badwords_and_blacklist(current_user.id)
     form = fill_form_with_user(current_user, badwords, blacklist)
     suggest = "README: separate each forbidden word and each blacklisted user with a ','"
     return render_template("profile.html", 
-        mphoto = current_user.photo, 
+        mphoto = profile_photo_url(), 
         form = form, 
         suggest = suggest)
 
+def profile_photo_url():
+    """
+    Returns the url of the photo of the logged user, whose photo
+    is not kept in the session. The url has not the version of
+    the photo, so the browser revalidates it with the ETag
+    """
+    return url_for('media.user_photo', id = current_user.id)
+
+def get_badwords_and_blacklist(user_id):
+    """
+    Retrieves the badwords and the blacklist of the user together
+    :return: (badwords, blacklist)
+    """
+    return gather(
+        partial(UserManager.get_badwords_by_user_id, user_id),
+        partial(UserManager.get_blacklist_by_user_id, user_id)
+    )
+
 def fill_form_with_user(user, badwords, blacklist):
     """
     Programatically fill the UserForm with a User
@@ -1,8 +1,15 @@
-from flask import Blueprint, abort
+from flask import Blueprint, Response, abort, current_app, stream_with_context
 
 # this is only a utility view
 utils = Blueprint('util', __name__)
 
+# characters of the streamed pages sent together
+STREAM_BUFFER_SIZE = 16 * 1024
+
+# shown in place of the rest of a streamed page if its rendering fails,
+# the status code has already been sent
+STREAM_ERROR = '<p id="stream_error" style="color: red;">We have encountered a server error.</p>'
+
 
 @utils.route('/server_error')
 def generate_server_error():
@@ -11,3 +18,48 @@ def generate_server_error():
     :return: Error 500
     """
     return abort(500)
+
+
+def flush():
+    """
+    Template global, {{ flush() }} sends the page rendered so far
+    when the page is streamed, it does nothing otherwise
+    """
+    return ''
+
+
+def stream_template(template_name, **context):
+    """
+    Like render_template, but the page is sent while it is rendered:
+    the shell is sent as soon as the template calls flush(), then
+    the rest in pieces of STREAM_BUFFER_SIZE, so the lists passed as
+    generators are consumed one item at a time and never held in memory.
+    The request context is kept until the page is over.
+    :return: the streamed Response
+    """
+    flushed = []
+
+    def flush_stream():
+        flushed.append(True)
+        return ''
+
+    current_app.update_template_context(context)
+    context['flush'] = flush_stream
+    template = current_app.jinja_env.get_template(template_name)
+
+    def generate():
+        buffer, size = [], 0
+        try:
+            for piece in template.generate(context):
+                buffer.append(piece)
+                size += len(piece)
+                if size >= STREAM_BUFFER_SIZE or flushed:
+                    yield ''.join(buffer)
+                    buffer, size = [], 0
+                    del flushed[:]
+        except Exception:
+            current_app.logger.exception('Streaming of %s failed' % template_name)
+            buffer.append(STREAM_ERROR)
+        yield ''.join(buffer)
+
+    return Response(stream_with_context(generate()))
@@ -0,0 +1,4 @@
+import os
+
+# the tests use an in-process redis, see REDIS_IN_PROCESS
+os.environ.setdefault('REDIS_IN_PROCESS', 'true')
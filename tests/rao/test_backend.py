@@ -0,0 +1,251 @@
+import os
+import time
+from unittest.mock import Mock, patch
+from requests.adapters import HTTPAdapter
+from .rao_test import RaoTest
+
+
+class TestBackend(RaoTest):
+
+    def setUp(self):
+        super(TestBackend, self).setUp()
+        from mib.rao.backend import Backend
+        from mib import app
+
+        self.backend = Backend('test', 'http://localhost:1')
+        self.app = app
+
+    def tearDown(self):
+        self.backend.close()
+
+    def test_session_is_shared(self):
+        session = self.backend.session
+        assert self.backend.session is session
+
+    def test_session_pool(self):
+        adapter = self.backend.session.get_adapter('http://localhost:1')
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter._pool_maxsize == self.app.config['REQUESTS_POOL_MAXSIZE']
+        # the retries are made by the backend, within the deadline
+        assert adapter.max_retries.total == 0
+
+    @patch('mib.rao.backend.os.getpid')
+    def test_session_rebuilt_after_fork(self, mock_getpid):
+        mock_getpid.return_value = 1
+        session = self.backend.session
+        mock_getpid.return_value = 2
+        assert self.backend.session is not session
+
+    def test_request(self):
+        session = Mock()
+        session.request.return_value = Mock(status_code=200)
+        self.backend._session = session
+        self.backend._pid = os.getpid()
+        response = self.backend.get('http://localhost:1/user/1', timeout=1)
+        assert response.status_code == 200
+        session.request.assert_called_once_with('GET', 'http://localhost:1/user/1', timeout=1)
+
+    def mock_session(self, **kwargs):
+        session = Mock()
+        session.request = Mock(**kwargs)
+        self.backend._session = session
+        self.backend._pid = os.getpid()
+        return session
+
+    @patch.dict('mib.app.config', REQUESTS_MAX_RETRIES=0)
+    def test_circuit_opens_on_failures(self):
+        import requests
+        from mib.rao.backend import BackendUnavailable
+        session = self.mock_session(side_effect=requests.exceptions.Timeout())
+        for _ in range(self.app.config['CIRCUIT_BREAKER_MIN_CALLS']):
+            with self.assertRaises(requests.exceptions.Timeout):
+                self.backend.get('http://localhost:1/user/1')
+        calls = session.request.call_count
+        # the circuit is open, the backend is not contacted
+        with self.assertRaises(BackendUnavailable):
+            self.backend.get('http://localhost:1/user/1')
+        assert session.request.call_count == calls
+        assert self.backend.breaker.state == 'open'
+
+    @patch.dict('mib.app.config', REQUESTS_MAX_RETRIES=0)
+    def test_server_errors_are_failures(self):
+        self.mock_session(return_value=Mock(status_code=503))
+        for _ in range(self.app.config['CIRCUIT_BREAKER_MIN_CALLS']):
+            self.backend.get('http://localhost:1/user/1')
+        assert self.backend.breaker.state == 'open'
+
+    def test_client_errors_are_not_failures(self):
+        self.mock_session(return_value=Mock(status_code=404))
+        for _ in range(self.app.config['CIRCUIT_BREAKER_MIN_CALLS']):
+            self.backend.get('http://localhost:1/user/1')
+        assert self.backend.breaker.state == 'closed'
+
+    def test_bulkhead(self):
+        import threading
+        from mib.rao.backend import BackendUnavailable
+        release = threading.Event()
+        self.mock_session(side_effect=lambda *args, **kwargs: release.wait(5) and Mock(status_code=200))
+        threads = [threading.Thread(target=self.backend.get, args=('http://localhost:1/',))
+                   for _ in range(self.backend.max_concurrent)]
+        for thread in threads:
+            thread.start()
+        try:
+            with self.assertRaises(BackendUnavailable):
+                self.backend.get('http://localhost:1/')
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+        assert self.backend.get('http://localhost:1/').status_code == 200
+
+    def test_bulkhead_below_the_threads(self):
+        threads = int(os.getenv('GUNICORN_THREADS', 4))
+        assert 0 < self.backend.max_concurrent < threads
+
+    def test_limits_scale_with_the_worker(self):
+        import config
+        import importlib
+        with patch.dict(os.environ, GUNICORN_WORKER_CLASS='gevent', GUNICORN_WORKER_CONNECTIONS='1000'):
+            gevent_config = importlib.reload(config).Config
+        importlib.reload(config)
+        assert gevent_config.WORKER_CONCURRENCY == 1000
+        assert gevent_config.BULKHEAD_MAX_CONCURRENT == 750
+        assert gevent_config.REQUESTS_POOL_MAXSIZE == 1000
+
+    def test_calls_of_a_request_share_the_slot(self):
+        from mib.rao.parallel import parallel_map
+        self.mock_session(side_effect=lambda *args, **kwargs: time.sleep(0.05) or Mock(status_code=200))
+        with self.app.test_request_context('/'):
+            codes = parallel_map(lambda url: self.backend.get(url).status_code,
+                                 ['http://localhost:1/%d' % i for i in range(8)], 8)
+        assert codes == [200] * 8
+        assert self.backend._bulkhead._value == self.backend.max_concurrent
+
+    def test_streamed_response_keeps_the_slot(self):
+        response = Mock(status_code=200)
+        self.mock_session(return_value=response)
+        free = self.backend._bulkhead._value
+        self.backend.get('http://localhost:1/', stream=True)
+        assert self.backend._bulkhead._value == free - 1
+        response.close()
+        response.close()
+        assert self.backend._bulkhead._value == free
+
+    def test_open_circuit_is_error_500(self):
+        from mib.rao.user_manager import UserManager
+        from werkzeug.exceptions import InternalServerError
+        with patch.object(UserManager.backend.breaker, 'allow', return_value=False):
+            with self.assertRaises(InternalServerError):
+                UserManager.get_badwords_by_user_id(1)
+
+    def test_default_timeouts(self):
+        session = self.mock_session(return_value=Mock(status_code=200))
+        self.backend.get('http://localhost:1/')
+        _, kwargs = session.request.call_args
+        assert kwargs['timeout'] == (self.app.config['REQUESTS_CONNECT_TIMEOUT_SECONDS'],
+                                     self.app.config['REQUESTS_TIMEOUT_SECONDS'])
+        assert 'headers' not in kwargs
+
+    def test_deadline_bounds_timeouts(self):
+        from mib.rao import deadline
+        session = self.mock_session(return_value=Mock(status_code=200))
+        with self.app.test_request_context('/'):
+            deadline.start(0.5)
+            self.backend.get('http://localhost:1/', headers={'Accept': 'application/json'})
+        _, kwargs = session.request.call_args
+        connect, read = kwargs['timeout']
+        assert connect <= 0.5 and read <= 0.5
+        budget = int(kwargs['headers'][self.backend.DEADLINE_HEADER])
+        assert 0 < budget <= 500
+        assert kwargs['headers']['Accept'] == 'application/json'
+
+    def test_deadline_expired(self):
+        from mib.rao import deadline
+        from mib.rao.backend import DeadlineExceeded
+        session = self.mock_session(return_value=Mock(status_code=200))
+        with self.app.test_request_context('/'):
+            deadline.start(0)
+            with self.assertRaises(DeadlineExceeded):
+                self.backend.get('http://localhost:1/')
+        session.request.assert_not_called()
+        assert self.backend.breaker.state == 'closed'
+
+    def test_json_body_encoded_by_codec(self):
+        session = self.mock_session(return_value=Mock(status_code=201))
+        self.backend.post('http://localhost:1/user', json={'photo': 'a/b+c=='})
+        kwargs = session.request.call_args[1]
+        assert 'json' not in kwargs
+        assert kwargs['data'] == b'{"photo":"a/b+c=="}'
+        assert kwargs['headers']['Content-Type'] == 'application/json'
+
+    def test_json_response_decoded_by_codec(self):
+        self.mock_session(return_value=Mock(status_code=200, content=b'{"body":[1,2]}'))
+        response = self.backend.get('http://localhost:1/users')
+        assert response.json() == {'body': [1, 2]}
+
+    @patch('mib.rao.backend.time.sleep')
+    def test_retries(self, mock_sleep):
+        import requests
+        session = self.mock_session(side_effect=[
+            requests.exceptions.ReadTimeout(), Mock(status_code=503), Mock(status_code=200)])
+        assert self.backend.get('http://localhost:1/').status_code == 200
+        assert session.request.call_count == 3
+        assert mock_sleep.call_count == 2
+
+    @patch('mib.rao.backend.time.sleep')
+    def test_retries_exhausted(self, mock_sleep):
+        self.mock_session(return_value=Mock(status_code=503))
+        assert self.backend.get('http://localhost:1/').status_code == 503
+        assert self.backend.session.request.call_count == self.app.config['REQUESTS_MAX_RETRIES'] + 1
+
+    @patch('mib.rao.backend.time.sleep')
+    def test_retried_stream_closed(self, mock_sleep):
+        failed, ok = Mock(status_code=503), Mock(status_code=200)
+        failed_close, ok_close = failed.close, ok.close
+        self.mock_session(side_effect=[failed, ok])
+        free = self.backend._bulkhead._value
+        response = self.backend.get('http://localhost:1/', stream=True)
+        assert response is ok
+        assert failed_close.called and not ok_close.called
+        # only the slot of the returned response is held
+        assert self.backend._bulkhead._value == free - 1
+        response.close()
+
+    def test_call_timeout_overrides_the_backend(self):
+        session = self.mock_session(return_value=Mock(status_code=200))
+        self.backend.get('http://localhost:1/users', timeout=(1, 20))
+        assert session.request.call_args[1]['timeout'] == (1, 20)
+
+    @patch('mib.rao.backend.time.sleep')
+    def test_post_retried_only_if_not_sent(self, mock_sleep):
+        import requests
+        from urllib3.exceptions import MaxRetryError, NewConnectionError
+        session = self.mock_session(side_effect=requests.exceptions.ReadTimeout())
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.backend.post('http://localhost:1/message', json={})
+        assert session.request.call_count == 1
+        refused = requests.exceptions.ConnectionError(
+            MaxRetryError(None, '/', NewConnectionError(None, 'refused')))
+        session = self.mock_session(side_effect=[refused, Mock(status_code=201)])
+        assert self.backend.post('http://localhost:1/message', json={}).status_code == 201
+        assert session.request.call_count == 2
+
+    def test_retries_within_the_deadline(self):
+        import requests
+        from mib.rao import deadline
+        budgets = []
+
+        def slow_failure(*args, **kwargs):
+            budgets.append(int(kwargs['headers'][self.backend.DEADLINE_HEADER]))
+            time.sleep(kwargs['timeout'][1])
+            raise requests.exceptions.ReadTimeout()
+        self.mock_session(side_effect=slow_failure)
+        with self.app.test_request_context('/'):
+            deadline.start(0.3)
+            start = time.monotonic()
+            with self.assertRaises(requests.exceptions.Timeout):
+                self.backend.get('http://localhost:1/')
+            elapsed = time.monotonic() - start
+        # the first attempt spends the whole budget, it is not retried
+        assert budgets and len(budgets) == 1
+        assert elapsed < 0.5
@@ -0,0 +1,63 @@
+from unittest.mock import patch
+from .rao_test import RaoTest
+
+
+class TestBadwords(RaoTest):
+
+    def setUp(self):
+        super(TestBadwords, self).setUp()
+        from mib.rao.badwords import BadwordsCache, BadwordsMatcher, MessageBody
+        from mib.rao.user_manager import UserManager
+
+        self.cache = BadwordsCache
+        self.matcher = BadwordsMatcher
+        self.body = MessageBody
+        self.user_manager = UserManager
+
+    def tearDown(self):
+        for user_id in (1, 2, 3):
+            self.cache.invalidate(user_id)
+
+    def test_words(self):
+        matcher = self.matcher(['evil', 'devil'])
+        assert self.body('You are evil!').contains(matcher)
+        assert not self.body('You are medieval.').contains(matcher)
+
+    def test_phrases(self):
+        matcher = self.matcher(['bad guy'])
+        assert self.body('What a  bad, guy').contains(matcher)
+        assert not self.body('bad weather, good guy').contains(matcher)
+
+    def test_empty_badwords(self):
+        # the registration without badwords stores ['']
+        assert not self.body('Hello, world!').contains(self.matcher(['']))
+
+    def test_body_scanned_once_per_filter(self):
+        body = self.body('evil')
+        matcher = self.matcher(['evil'])
+        with patch.object(matcher, 'matches', wraps=matcher.matches) as matches:
+            body.contains(matcher)
+            body.contains(matcher)
+            assert matches.call_count == 1
+
+    def test_cache_shares_matchers(self):
+        first = self.cache.put(1, ['evil'])
+        second = self.cache.put(2, ['evil'])
+        assert first is second
+        assert self.cache.get(1) is first
+
+    @patch('mib.rao.user_manager.UserManager.get_badwords_by_user_ids')
+    def test_get_badwords_matchers(self, mock_get):
+        mock_get.return_value = [['evil']]
+        self.cache.put(1, ['devil'])
+        matchers = self.user_manager.get_badwords_matchers([1, 3])
+        mock_get.assert_called_once_with([3])
+        assert matchers[0].words == {'devil'}
+        assert matchers[1].words == {'evil'}
+
+    @patch('mib.rao.user_manager.UserManager.update')
+    def test_update_badwords_invalidates(self, mock_update):
+        mock_update.return_value = ['evil']
+        self.cache.put(1, ['devil'])
+        self.user_manager.update_badwords(1, ['evil'])
+        assert self.cache.get(1) is None
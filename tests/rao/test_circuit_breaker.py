@@ -0,0 +1,103 @@
+from unittest.mock import patch
+from mib.rao.circuit_breaker import CircuitBreaker
+
+
+def breaker():
+    return CircuitBreaker(window=4, min_calls=4, failure_rate=0.5, open_seconds=10)
+
+
+def test_closed_below_rate():
+    circuit = breaker()
+    for success in (True, True, True, False):
+        assert circuit.allow()
+        circuit.record(success)
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def test_not_opened_before_min_calls():
+    circuit = breaker()
+    for _ in range(3):
+        circuit.record(False)
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def test_opens_at_rate():
+    circuit = breaker()
+    opened = [circuit.record(success) for success in (True, False, True, False)]
+    assert opened == [False, False, False, True]
+    assert circuit.state == CircuitBreaker.OPEN
+    assert not circuit.allow()
+
+
+@patch('mib.rao.circuit_breaker.time.monotonic')
+def test_half_open_trial(mock_monotonic):
+    mock_monotonic.return_value = 0
+    circuit = breaker()
+    for _ in range(4):
+        circuit.record(False)
+    mock_monotonic.return_value = 10
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    # only one trial call at a time
+    trial = circuit.allow()
+    assert trial
+    assert not circuit.allow()
+    circuit.record(True, trial)
+    assert circuit.state == CircuitBreaker.CLOSED
+    assert circuit.allow()
+
+
+@patch('mib.rao.circuit_breaker.time.monotonic')
+def test_half_open_failure(mock_monotonic):
+    mock_monotonic.return_value = 0
+    circuit = breaker()
+    for _ in range(4):
+        circuit.record(False)
+    mock_monotonic.return_value = 10
+    trial = circuit.allow()
+    assert circuit.record(False, trial)
+    assert circuit.state == CircuitBreaker.OPEN
+    mock_monotonic.return_value = 15
+    assert not circuit.allow()
+
+
+@patch('mib.rao.circuit_breaker.time.monotonic')
+def test_half_open_unknown_outcome(mock_monotonic):
+    mock_monotonic.return_value = 0
+    circuit = breaker()
+    for _ in range(4):
+        circuit.record(False)
+    mock_monotonic.return_value = 10
+    trial = circuit.allow()
+    circuit.record(None, trial)
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    assert circuit.allow()
+
+
+@patch('mib.rao.circuit_breaker.time.monotonic')
+def test_half_open_ignores_late_calls(mock_monotonic):
+    mock_monotonic.return_value = 0
+    circuit = breaker()
+    late = circuit.allow()
+    for _ in range(4):
+        circuit.record(False)
+    mock_monotonic.return_value = 10
+    trial = circuit.allow()
+    # a call allowed while closed ends during the trial
+    circuit.record(True, late)
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    circuit.record(True, trial)
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+@patch('mib.rao.circuit_breaker.time.monotonic')
+def test_late_failure_during_trial(mock_monotonic):
+    mock_monotonic.return_value = 0
+    circuit = breaker()
+    late = circuit.allow()
+    for _ in range(4):
+        circuit.record(False)
+    mock_monotonic.return_value = 10
+    trial = circuit.allow()
+    assert not circuit.record(False, late)
+    circuit.record(True, trial)
+    assert circuit.state == CircuitBreaker.CLOSED
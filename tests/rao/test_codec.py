@@ -0,0 +1,44 @@
+from unittest.mock import patch
+from .rao_test import RaoTest
+
+
+class TestCodec(RaoTest):
+
+    def setUp(self):
+        super(TestCodec, self).setUp()
+        from mib.rao import codec
+
+        self.codec = codec
+        self.selected = codec.codec
+
+    def tearDown(self):
+        self.codec.codec = self.selected
+
+    def test_round_trip(self):
+        payload = {'body': [{'id': 1, 'email': 'è@a.it', 'photo': 'data:image/png;base64,a/b+c==',
+                             'points': 1.5, 'draft': False, 'receiver': None}]}
+        for name in self.codec.CODECS:
+            selected = self.codec.get_codec(name)
+            assert selected.loads(selected.dumps(payload)) == payload
+            assert selected.loads(selected.dumps(payload).encode('utf-8')) == payload
+
+    def test_invalid_json(self):
+        for name in self.codec.CODECS:
+            with self.assertRaises(ValueError):
+                self.codec.get_codec(name).loads(b'{"body": ')
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            self.codec.get_codec('pickle')
+
+    def test_fallback(self):
+        with patch('mib.rao.codec.orjson', None):
+            assert self.codec.get_codec('orjson') is self.codec.UJsonCodec
+            with patch('mib.rao.codec.ujson', None):
+                assert self.codec.get_codec('orjson') is self.codec.JsonCodec
+                assert self.codec.get_codec('ujson') is self.codec.JsonCodec
+
+    def test_use(self):
+        self.codec.use('json')
+        assert self.codec.codec is self.codec.JsonCodec
+        assert self.codec.loads(self.codec.dumps({'a': [1]})) == {'a': [1]}
@@ -0,0 +1,95 @@
+from unittest.mock import Mock, patch
+from mockredis import MockRedis
+from .rao_test import RaoTest
+
+
+class TestDirectoryCache(RaoTest):
+
+    def setUp(self):
+        super(TestDirectoryCache, self).setUp()
+        from mib.rao.directory_cache import DirectoryCache
+        from mib.rao.user_manager import UserManager
+
+        self.directory_cache = DirectoryCache
+        self.user_manager = UserManager
+        self.redis = MockRedis(strict=True)
+        patcher = patch('mib.rao.directory_cache.redis_client', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate_users(self, first_name='Mario'):
+        return [{'id': 7, 'email': 'mario@rossi.it', 'first_name': first_name,
+                 'last_name': 'Rossi', 'birthdate': '01/01/1990',
+                 'photo': '', 'points': 0}]
+
+    def mock_response(self, users):
+        return Mock(status_code=200, json=Mock(return_value={'body': users}))
+
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_miss_then_hit(self, mock_get):
+        mock_get.return_value = self.mock_response(self.generate_users())
+        users = self.user_manager.get_all_users()
+        assert users[0].email == 'mario@rossi.it'
+        users = self.user_manager.get_all_users()
+        assert users[0].first_name == 'Mario'
+        assert mock_get.call_count == 1
+        assert self.redis.ttl(self.directory_cache.KEY) > 0
+
+    @patch('mib.rao.user_manager.threading.Thread')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_stale_is_served_and_refreshed(self, mock_get, mock_thread):
+        mock_get.return_value = self.mock_response(self.generate_users())
+        self.user_manager.get_all_users()
+        mock_get.return_value = self.mock_response(self.generate_users('Luigi'))
+        with patch.object(self.directory_cache, 'FRESH_SECONDS', -1):
+            users = self.user_manager.get_all_users()
+            # the stale list is served, the refresh is started only once
+            assert users[0].first_name == 'Mario'
+            self.user_manager.get_all_users()
+        assert mock_thread.call_count == 1
+        # runs the background refresh
+        mock_thread.call_args[1]['target']()
+        assert self.user_manager.get_all_users()[0].first_name == 'Luigi'
+        assert self.redis.get(self.directory_cache.REFRESH_KEY) is None
+
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_failed_refresh_keeps_stale(self, mock_get):
+        mock_get.return_value = self.mock_response(self.generate_users())
+        self.user_manager.get_all_users()
+        mock_get.return_value = Mock(status_code=500)
+        self.directory_cache.start_refresh()
+        self.user_manager.refresh_directory()
+        assert self.user_manager.get_all_users()[0].first_name == 'Mario'
+        assert self.redis.get(self.directory_cache.REFRESH_KEY) is None
+
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_fresh_read(self, mock_get):
+        mock_get.return_value = self.mock_response(self.generate_users())
+        self.user_manager.get_all_users()
+        mock_get.return_value = self.mock_response(self.generate_users('Luigi'))
+        assert self.user_manager.get_all_users(fresh=True)[0].first_name == 'Luigi'
+        assert self.user_manager.get_all_users()[0].first_name == 'Luigi'
+
+    @patch('mib.rao.user_manager.UserManager.backend.delete')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_invalidated_on_delete(self, mock_get, mock_delete):
+        mock_get.return_value = self.mock_response(self.generate_users())
+        mock_delete.return_value = Mock(status_code=202, json=Mock(return_value={}))
+        self.user_manager.get_all_users()
+        with self.app.test_request_context('/'):
+            self.user_manager.delete_user(7)
+        assert self.directory_cache.get() is None
+
+    @patch('mib.rao.user_manager.threading.Thread')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_find_users_syncs_index(self, mock_get, mock_thread):
+        from mib.rao.search_index import UserSearchIndex
+        with patch.object(self.user_manager, 'search_index', UserSearchIndex()):
+            mock_get.return_value = self.mock_response(self.generate_users())
+            assert self.user_manager.find_users('mar')[0].email == 'mario@rossi.it'
+            mock_get.return_value = self.mock_response(self.generate_users('Luigi'))
+            with patch.object(self.user_manager, 'SEARCH_INDEX_REFRESH_SECONDS', -1):
+                assert self.user_manager.find_users('luigi') == []
+            self.directory_cache.invalidate()
+            mock_thread.call_args[1]['target']()
+            assert self.user_manager.find_users('luigi')[0].id == 7
@@ -0,0 +1,69 @@
+import json
+import pytest
+from mib.rao.json_stream import iter_array
+
+
+def split(document, size):
+    data = json.dumps(document).encode('utf-8')
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 3, 64, 1 << 20])
+def test_iter_array(size):
+    document = {'count': 3, 'meta': {'skip': [1, {'body': ']}'}]},
+                'body': [{'id': id, 'body': 'è arrivato ]} %d' % id, 'points': 1.5e3}
+                         for id in range(20)],
+                'offset': 12}
+    assert list(iter_array(split(document, size), 'body')) == document['body']
+
+
+def test_iter_array_nested():
+    document = {'body': {'filtered_inbox': [1, 22, 333], 'filtered_sent': []}}
+    assert list(iter_array(split(document, 2), 'body', 'filtered_inbox')) == [1, 22, 333]
+    assert list(iter_array(split(document, 2), 'body', 'filtered_sent')) == []
+
+
+def test_keys():
+    from mib.rao.json_stream import JsonStream
+    document = {'body': {'filtered_inbox': [1, 22], 'count': {'a': 1}, 'filtered_sent': []}}
+    stream = JsonStream(split(document, 3))
+    stream.enter('body')
+    read = {}
+    for key in stream.keys():
+        read[key] = list(stream.items()) if key.startswith('filtered') else stream.value()
+    assert read == document['body']
+    assert list(JsonStream([b'{}']).keys()) == []
+
+
+def test_iter_array_is_lazy():
+    def chunks():
+        yield b'{"body": [{"id": 1}, '
+        raise AssertionError('read too far')
+
+    assert next(iter_array(chunks(), 'body')) == {'id': 1}
+
+
+def test_iter_array_missing_key():
+    with pytest.raises(KeyError):
+        list(iter_array([b'{"offset": 1}'], 'body'))
+    with pytest.raises(KeyError):
+        list(iter_array([b'{}'], 'body'))
+
+
+def test_iter_array_invalid():
+    with pytest.raises(ValueError):
+        list(iter_array([b'[1, 2]'], 'body'))
+    with pytest.raises(ValueError):
+        list(iter_array([b'{"body": [1, '], 'body'))
+
+
+def test_long_item_decoded_few_times():
+    from unittest.mock import patch
+    from mib.rao import json_stream
+    document = {'body': [{'id': 1, 'photo': 'x' * 100000}, {'id': 2}]}
+    decoder = json_stream._decoder
+    with patch.object(json_stream, '_decoder') as mock_decoder:
+        mock_decoder.raw_decode.side_effect = decoder.raw_decode
+        assert list(iter_array(split(document, 10), 'body')) == document['body']
+    # the buffer doubles between two attempts, instead of a chunk
+    assert mock_decoder.raw_decode.call_count < 50
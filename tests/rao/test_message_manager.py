@@ -0,0 +1,269 @@
+from unittest.mock import Mock, patch
+import requests
+from mib.rao.message import Message
+from .rao_test import RaoTest
+
+
+class TestMessageManager(RaoTest):
+
+    def setUp(self):
+        super(TestMessageManager, self).setUp()
+        from mib.rao.message_manager import MessageManager
+
+        self.message_manager = MessageManager
+        self.message_manager.BULK_CREATE_AVAILABLE = True
+        self.message_manager.BULK_UPDATE_AVAILABLE = True
+        self.message_manager.PATCH_AVAILABLE = True
+
+    def tearDown(self):
+        self.message_manager.BULK_CREATE_AVAILABLE = True
+        self.message_manager.BULK_UPDATE_AVAILABLE = True
+        self.message_manager.PATCH_AVAILABLE = True
+
+    def generate_message(self, receiver):
+        return Message(id=-1, sender_id=1, receiver_id=2, sender='a@a.it',
+                       receiver=receiver, body='Hello', photo='',
+                       timestamp='01/01/2030 10:00', draft=False, scheduled=True,
+                       sent=0, read=0, deleted=0, bold=False, italic=False,
+                       underline=False)
+
+    @patch('mib.rao.message_manager.MessageManager.backend.post')
+    def test_create_messages_bulk(self, mock_post):
+        messages = [self.generate_message('b@b.it'), self.generate_message('c@c.it')]
+        mock_post.return_value = Mock(
+            status_code=201,
+            json=lambda: {'body': [message.serialize() for message in messages]}
+        )
+        created, failed, unknown = self.message_manager.create_messages(messages)
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[0][0].endswith('/messages')
+        assert [message.receiver for message in created] == ['b@b.it', 'c@c.it']
+        assert failed == [] and unknown == []
+
+    @patch('mib.rao.message_manager.MessageManager.backend.post')
+    def test_create_messages_bulk_timeout(self, mock_post):
+        messages = [self.generate_message('b@b.it'), self.generate_message('c@c.it')]
+        mock_post.side_effect = requests.exceptions.ReadTimeout()
+        created, failed, unknown = self.message_manager.create_messages(messages)
+        # the messages may have been created, so they are not sent again
+        assert mock_post.call_count == 1
+        assert created == [] and failed == []
+        assert unknown == messages
+
+    @patch('mib.rao.message_manager.MessageManager.backend.post')
+    def test_create_messages_bulk_not_sent(self, mock_post):
+        messages = [self.generate_message('b@b.it')]
+        mock_post.side_effect = requests.exceptions.ConnectTimeout()
+        created, failed, unknown = self.message_manager.create_messages(messages)
+        assert created == [] and unknown == []
+        assert failed == messages
+
+    @patch('mib.rao.message_manager.MessageManager.backend.post')
+    def test_create_messages_fallback(self, mock_post):
+        messages = [self.generate_message('b@b.it'), self.generate_message('c@c.it')]
+
+        def post(url, json, **kwargs):
+            if url.endswith('/messages'):
+                return Mock(status_code=404)
+            if json['receiver'] == 'c@c.it':
+                return Mock(status_code=500, json=lambda: {})
+            if json['receiver'] == 'd@d.it':
+                # an error page of a proxy
+                return Mock(status_code=502, json=Mock(side_effect=ValueError))
+            if json['receiver'] == 'e@e.it':
+                raise requests.exceptions.ReadTimeout()
+            return Mock(status_code=201, json=lambda: {'body': json})
+
+        messages += [self.generate_message('d@d.it'), self.generate_message('e@e.it')]
+        mock_post.side_effect = post
+        created, failed, unknown = self.message_manager.create_messages(messages)
+        assert [message.receiver for message in created] == ['b@b.it']
+        assert [message.receiver for message in failed] == ['c@c.it', 'd@d.it']
+        assert [message.receiver for message in unknown] == ['e@e.it']
+        assert not self.message_manager.BULK_CREATE_AVAILABLE
+
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_acknowledge_read_receipts_bulk(self, mock_patch):
+        mock_patch.return_value = Mock(status_code=204)
+        self.message_manager.acknowledge_read_receipts([3, 4, 5], 1)
+        assert mock_patch.call_count == 1
+        assert mock_patch.call_args[0][0].endswith('/messages')
+        assert mock_patch.call_args[1]['json'] == {'ids': [3, 4, 5], 'sent': 2}
+
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_acknowledge_no_read_receipts(self, mock_patch):
+        self.message_manager.acknowledge_read_receipts([], 1)
+        mock_patch.assert_not_called()
+
+    @patch('mib.rao.message_manager.MessageManager.backend.put')
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_acknowledge_read_receipts_fallback(self, mock_patch, mock_get, mock_put):
+        mock_patch.return_value = Mock(status_code=405)
+        message = self.generate_message('b@b.it')
+        message.sent = 1
+        mock_get.return_value = Mock(status_code=200, json=lambda: {'body': message.serialize()})
+        mock_put.side_effect = lambda url, json, **kwargs: Mock(status_code=200, json=lambda: {'body': json})
+        self.message_manager.acknowledge_read_receipts([3, 4], 1)
+        assert mock_get.call_count == 2
+        assert [call[1]['json']['sent'] for call in mock_put.call_args_list] == [2, 2]
+        assert not self.message_manager.BULK_UPDATE_AVAILABLE
+
+    @patch('mib.rao.message_manager.NotificationCache.invalidate')
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_acknowledge_read_receipts_patched(self, mock_patch, mock_invalidate):
+        message = self.generate_message('b@b.it')
+        mock_patch.side_effect = [Mock(status_code=404)] + [
+            Mock(status_code=200, json=lambda: {'body': message.serialize()})] * 2
+        self.message_manager.acknowledge_read_receipts([3, 4], 1)
+        assert [call[1]['json'] for call in mock_patch.call_args_list[1:]] == [{'sent': 2}] * 2
+        mock_invalidate.assert_any_call(1)
+
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_patch_missing_message(self, mock_patch):
+        from werkzeug.exceptions import NotFound
+        mock_patch.return_value = Mock(status_code=404, json=lambda: {'message': 'not found'})
+        with self.assertRaises(NotFound):
+            self.message_manager.patch_message(3, read = 1)
+        assert self.message_manager.PATCH_AVAILABLE
+
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_acknowledge_deleted_message(self, mock_patch):
+        message = self.generate_message('b@b.it')
+        self.message_manager.BULK_UPDATE_AVAILABLE = False
+        mock_patch.side_effect = lambda url, **kwargs: Mock(status_code=404, json=lambda: {}) \
+            if url.endswith('/3') else Mock(status_code=200, json=lambda: {'body': message.serialize()})
+        # the deleted message is skipped, the other one is acknowledged
+        self.message_manager.acknowledge_read_receipts([3, 4], 1)
+        assert mock_patch.call_count == 2
+
+    def test_message_changes(self):
+        message = self.generate_message('b@b.it')
+        assert message.changes() == {}
+        message.read = 0
+        assert message.changes() == {}
+        message.read = 1
+        message.deleted = 2
+        assert message.changes() == {'read': 1, 'deleted': 2}
+        message.clean()
+        assert message.changes() == {}
+        assert 'photo' in Message().changes()
+
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_save_changes(self, mock_patch):
+        message = self.generate_message('b@b.it')
+        message.id = 3
+        message.photo = 'a' * 1000
+        message.clean()
+        mock_patch.side_effect = lambda url, json, **kwargs: Mock(
+            status_code=200, json=lambda: {'body': dict(message.serialize(), **json)})
+        message.read = 1
+        self.message_manager.save_changes(message)
+        assert mock_patch.call_args[0][0].endswith('/message/3')
+        assert mock_patch.call_args[1]['json'] == {'read': 1}
+        assert message.changes() == {}
+        # nothing changed, nothing sent
+        self.message_manager.save_changes(message)
+        assert mock_patch.call_count == 1
+
+    @patch('mib.rao.message_manager.MessageManager.backend.put')
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    @patch('mib.rao.message_manager.MessageManager.backend.patch')
+    def test_patch_message_fallback(self, mock_patch, mock_get, mock_put):
+        mock_patch.return_value = Mock(status_code=405)
+        message = self.generate_message('b@b.it')
+        mock_get.return_value = Mock(status_code=200, json=lambda: {'body': message.serialize()})
+        mock_put.side_effect = lambda url, json, **kwargs: Mock(status_code=200, json=lambda: {'body': json})
+        updated = self.message_manager.patch_message(3, deleted = 1)
+        assert updated.deleted == 1
+        assert mock_put.call_args[1]['json']['deleted'] == 1
+        assert not self.message_manager.PATCH_AVAILABLE
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_get_dir_page(self, mock_get):
+        size = self.message_manager.PAGE_SIZE
+        messages = [self.generate_message('b@b.it').serialize() for _ in range(size + 1)]
+        mock_get.return_value = Mock(
+            status_code=200,
+            json=lambda: {'body': messages, 'offset': size}
+        )
+        inbox = self.message_manager.get_inbox('b@b.it', 2, page=2)
+        assert mock_get.call_args[1]['params'] == {
+            'projection': 'summary', 'offset': size, 'limit': size + 1
+        }
+        assert len(inbox) == size + 1
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_get_dir_page_not_paginated(self, mock_get):
+        size = self.message_manager.PAGE_SIZE
+        messages = [self.generate_message('b@b.it').serialize() for _ in range(size + 5)]
+        mock_get.return_value = Mock(status_code=200, json=lambda: {'body': messages})
+        assert len(self.message_manager.get_inbox('b@b.it', 2, page=1)) == size + 1
+        assert len(self.message_manager.get_inbox('b@b.it', 2, page=2)) == 5
+        assert len(self.message_manager.get_inbox('b@b.it', 2)) == size + 5
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_get_dir_without_photos(self, mock_get):
+        message = self.generate_message('b@b.it')
+        message.photo = 'a' * 1024
+        mock_get.return_value = Mock(status_code=200, json=lambda: {'body': [message.serialize()]})
+        inbox = self.message_manager.get_inbox('b@b.it', 2)
+        assert mock_get.call_args[1]['params'] == {'projection': 'summary'}
+        assert inbox[0].photo is None
+        assert inbox[0].body == 'Hello'
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_iter_dir(self, mock_get):
+        import json
+        messages = [self.generate_message('b@b.it').serialize() for _ in range(50)]
+        document = json.dumps({'body': messages}).encode('utf-8')
+        response = Mock(status_code=200)
+        response.iter_content.return_value = (document[i:i + 7] for i in range(0, len(document), 7))
+        mock_get.return_value = response
+        inbox = self.message_manager.iter_dir('inbox', 'b@b.it', 2)
+        assert mock_get.call_args[1]['stream']
+        assert mock_get.call_args[1]['params'] == {'projection': 'summary'}
+        assert next(inbox).receiver == 'b@b.it'
+        assert not response.close.called
+        assert len(list(inbox)) == 49
+        assert response.close.called
+
+    @patch('mib.rao.message_manager.MessageManager.backend.post')
+    def test_search_streamed(self, mock_post):
+        import json
+        message = self.generate_message('b@b.it').serialize()
+        document = json.dumps({'body': {'filtered_scheduled': [message],
+                                        'filtered_inbox': [message, message],
+                                        'filtered_sent': []}}).encode('utf-8')
+        response = Mock(status_code=200)
+        response.iter_content.return_value = (document[i:i + 7] for i in range(0, len(document), 7))
+        mock_post.return_value = response
+        inbox, sent, scheduled = self.message_manager.get_filtered_messages(2, 'b@b.it', 'Hello', '', '')
+        assert mock_post.call_args[1]['stream']
+        assert [len(inbox), len(sent), len(scheduled)] == [2, 0, 1]
+        assert inbox[0].receiver == 'b@b.it'
+        assert response.close.called
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_iter_dir_error(self, mock_get):
+        mock_get.return_value = Mock(status_code=500)
+        with self.assertRaises(RuntimeError):
+            self.message_manager.iter_dir('inbox', 'b@b.it', 2)
+        assert mock_get.return_value.close.called
+
+    @patch('mib.rao.message_manager.MessageManager.backend.get')
+    def test_notifications_cache(self, mock_get):
+        from mockredis import MockRedis
+        with patch('mib.rao.notification_cache.redis_client', MockRedis(strict=True)):
+            mock_get.return_value = Mock(status_code=200, json=lambda: {'body': {'inbox': 1, 'sent': 0}})
+            assert self.message_manager.get_notifications_number('b@b.it', 2) == {'inbox': 1, 'sent': 0}
+            assert self.message_manager.get_notifications_number('b@b.it', 2) == {'inbox': 1, 'sent': 0}
+            assert mock_get.call_count == 1
+
+            # a new message for the user changes its notifications
+            with patch('mib.rao.message_manager.MessageManager.backend.post') as mock_post:
+                message = self.generate_message('b@b.it')
+                mock_post.return_value = Mock(status_code=201, json=lambda: {'body': message.serialize()})
+                self.message_manager.create_message(message)
+            self.message_manager.get_notifications_number('b@b.it', 2)
+            assert mock_get.call_count == 2
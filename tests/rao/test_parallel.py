@@ -0,0 +1,75 @@
+import threading
+import time
+import pytest
+from werkzeug.exceptions import HTTPException
+from flask import abort
+from mib.rao.parallel import gather, parallel_map
+
+
+def test_parallel_map_order():
+    assert parallel_map(lambda x: x * 2, [3, 1, 2], 4) == [6, 2, 4]
+
+
+def test_parallel_map_bound():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def call(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(item)
+        return item
+
+    assert parallel_map(call, range(10), 3) == list(range(10))
+    assert max(peak) <= 3
+
+
+def test_parallel_map_error():
+    def call(item):
+        if item == 2:
+            abort(500)
+        return item
+
+    with pytest.raises(HTTPException):
+        parallel_map(call, [1, 2, 3], 3)
+
+
+def test_gather_concurrent():
+    def call(result):
+        time.sleep(0.05)
+        return result
+
+    start = time.perf_counter()
+    assert gather(lambda: call(1), lambda: call(2), lambda: call(3)) == (1, 2, 3)
+    assert time.perf_counter() - start < 0.14
+
+
+def test_gather_request_context():
+    from mib import create_app
+    from flask import request
+    app = create_app()
+    with app.test_request_context('/profile?x=1'):
+        assert gather(lambda: request.args['x'], lambda: request.path) == ('1', '/profile')
+
+
+def test_gather_error():
+    def fail():
+        abort(500)
+
+    with pytest.raises(HTTPException):
+        gather(lambda: 1, fail)
+
+
+def test_parallel_map_deadline():
+    from mib import create_app
+    from mib.rao import deadline
+    app = create_app()
+    with app.test_request_context('/'):
+        deadline.start(10)
+        budgets = parallel_map(lambda _: deadline.remaining(), range(4), 4)
+    assert all(0 < budget <= 10 for budget in budgets)
+    assert deadline.remaining() is None
@@ -0,0 +1,53 @@
+from .rao_test import RaoTest
+
+
+class TestRedisStore(RaoTest):
+
+    def setUp(self):
+        super(TestRedisStore, self).setUp()
+        from mib import redis_client
+
+        self.redis = redis_client
+        self.redis.flushdb()
+
+    def test_in_process_redis(self):
+        assert self.app.config['REDIS_IN_PROCESS']
+        self.redis.setex('key', 10, 'value')
+        assert self.redis.get('key') == b'value'
+
+    def test_same_client_for_each_app(self):
+        from mib import create_app, redis_client
+        create_app()
+        assert redis_client is self.redis
+
+    def test_get_many(self):
+        self.redis.set('a', 1)
+        self.redis.set('c', 3)
+        assert self.redis.get_many(['a', 'b', 'c']) == {'a': b'1', 'c': b'3'}
+        assert self.redis.get_many([]) == {}
+
+    def test_set_many(self):
+        self.redis.set_many({'a': 1, 'b': 2}, 10)
+        assert self.redis.get_many(['a', 'b']) == {'a': b'1', 'b': b'2'}
+        assert 0 < self.redis.ttl('a') <= 10
+
+    def test_bounded_pool(self):
+        from redis import BlockingConnectionPool
+        from mib.rao.redis_store import GatewayRedis
+        client = GatewayRedis.from_url('redis://localhost:1/0', max_connections=3, timeout=0.1,
+                                       health_check_interval=30)
+        pool = client.connection_pool
+        assert isinstance(pool, BlockingConnectionPool)
+        assert pool.max_connections == 3
+        assert pool.timeout == 0.1
+        assert pool.connection_kwargs['health_check_interval'] == 30
+
+    def test_sessions_own_pool(self):
+        from unittest.mock import patch
+        from mib import build_session_redis
+        with patch.dict(self.app.config, REDIS_IN_PROCESS=False):
+            sessions = build_session_redis(self.app)
+        pool = sessions.connection_pool
+        assert pool.max_connections == self.app.config['REDIS_SESSION_MAX_CONNECTIONS']
+        assert pool.timeout == self.app.config['REDIS_SESSION_POOL_TIMEOUT']
+        assert sessions is not self.redis
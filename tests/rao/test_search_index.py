@@ -0,0 +1,80 @@
+from mib.auth.user import User
+from mib.rao.search_index import UserSearchIndex, tokenize
+
+
+def generate_user(id, first_name, last_name, email):
+    return User(id=id, email=email, first_name=first_name, last_name=last_name,
+                birthdate='01/01/1990', photo='jpeg', points=0)
+
+
+def generate_index():
+    index = UserSearchIndex()
+    index.sync([
+        generate_user(1, 'Mario', 'Rossi', 'mario.rossi@mail.it'),
+        generate_user(2, 'Maria', 'Bianchi', 'maria@bianchi.com'),
+        generate_user(3, 'Luigi', 'Verdi', 'luigi@verdi.it'),
+    ])
+    return index
+
+
+def ids(users):
+    return [user.id for user in users]
+
+
+def test_tokenize():
+    assert tokenize('Mario.Rossi@mail.it') == ['mario', 'rossi', 'mail', 'it']
+    assert tokenize(None) == []
+
+
+def test_search_by_prefix():
+    index = generate_index()
+    assert ids(index.search('mar')) == [1, 2]
+    assert ids(index.search('ROSS')) == [1]
+    assert ids(index.search('it')) == [1, 3]
+    assert ids(index.search('bianchi.com')) == [2]
+
+
+def test_search_all_words():
+    index = generate_index()
+    assert ids(index.search('mar ros')) == [1]
+    assert index.search('mario verdi') == []
+    assert index.search('') == []
+
+
+def test_users_without_photo():
+    user = generate_index().search('luigi')[0]
+    assert user.email == 'luigi@verdi.it'
+    assert user.photo is None
+
+
+def test_put_and_remove():
+    index = generate_index()
+    index.put(generate_user(1, 'Mario', 'Neri', 'mario.rossi@mail.it'))
+    assert ids(index.search('neri')) == [1]
+    assert index.search('rossi mario') == [index.search('neri')[0]]
+    index.remove(1)
+    assert ids(index.search('mar')) == [2]
+    index.remove(1)
+    assert len(index) == 2
+
+
+def test_incremental_sync():
+    index = generate_index()
+    index.sync([
+        generate_user(2, 'Maria', 'Bianchi', 'maria@bianchi.com'),
+        generate_user(3, 'Luigi', 'Gialli', 'luigi@verdi.it'),
+        generate_user(4, 'Anna', 'Rossi', 'anna@rossi.it'),
+    ])
+    assert ids(index.search('rossi')) == [4]
+    assert ids(index.search('gialli')) == [3]
+    assert index.search('verdi luigi') == index.search('gialli')
+    assert len(index) == 3
+
+
+def test_sync_from_empty():
+    index = generate_index()
+    for user_id in (1, 2, 3):
+        index.remove(user_id)
+    index.sync([generate_user(5, 'Paolo', 'Rossi', 'paolo@mail.it')])
+    assert ids(index.search('rossi')) == [5]
+    assert len(index) == 1
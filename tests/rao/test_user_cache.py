@@ -0,0 +1,79 @@
+from unittest.mock import Mock, patch
+from redis.exceptions import ConnectionError
+from mib.auth.user import User
+from .rao_test import RaoTest
+
+
+class TestUserCache(RaoTest):
+
+    def setUp(self):
+        super(TestUserCache, self).setUp()
+        from mib.rao.user_cache import UserCache
+        from mib.rao.user_manager import UserManager
+
+        self.user_cache = UserCache
+        self.user_manager = UserManager
+        from mib.rao.redis_store import in_process_provider
+        self.redis = in_process_provider()(strict=True)
+        patcher = patch('mib.rao.user_cache.redis_client', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate_user(self, id=7):
+        return User(id=id, email='mario%d@rossi.it' % id, first_name='Mario',
+                    last_name='Rossi', birthdate='01/01/1990',
+                    photo='jpeg', points=10)
+
+    def test_set_and_get(self):
+        self.user_cache.set(self.generate_user())
+        user = self.user_cache.get(7)
+        assert user.email == 'mario7@rossi.it'
+        assert user.points == 10
+        assert self.redis.ttl('user:7') > 0
+
+    def test_miss(self):
+        assert self.user_cache.get(8) is None
+
+    def test_invalidate(self):
+        self.user_cache.set(self.generate_user())
+        self.user_cache.invalidate(7)
+        assert self.user_cache.get(7) is None
+
+    def test_set_and_get_many(self):
+        self.user_cache.set_many([self.generate_user(7), self.generate_user(8)])
+        users = self.user_cache.get_many([7, 8, 9])
+        assert sorted(users) == [7, 8]
+        assert users[8].email == 'mario8@rossi.it'
+        assert self.redis.ttl('user:8') > 0
+
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    def test_get_users_by_ids(self, mock_get):
+        self.user_cache.set(self.generate_user(7))
+        fetched = self.generate_user(8)
+        mock_get.side_effect = lambda url, **kwargs: Mock(
+            status_code=200, json=lambda: {'body': fetched.serialize()}
+        ) if url.endswith('/8') else Mock(status_code=404, json=lambda: {})
+        users = self.user_manager.get_users_by_ids([7, 8, 9, 7])
+        assert sorted(users) == [7, 8]
+        # only the users that are not cached are requested
+        assert sorted(call[0][0][-1] for call in mock_get.call_args_list) == ['8', '9']
+        assert self.user_cache.get(8).email == 'mario8@rossi.it'
+
+    def test_redis_down(self):
+        down = Mock()
+        down.get.side_effect = ConnectionError()
+        down.setex.side_effect = ConnectionError()
+        down.get_many.side_effect = ConnectionError()
+        down.set_many.side_effect = ConnectionError()
+        with patch('mib.rao.user_cache.redis_client', down):
+            self.user_cache.set(self.generate_user())
+            assert self.user_cache.get(7) is None
+            self.user_cache.set_many([self.generate_user()])
+            assert self.user_cache.get_many([7]) == {}
+
+    @patch('mib.rao.user_manager.UserManager.backend.put')
+    def test_update_points_invalidates(self, mock_put):
+        mock_put.return_value = Mock(status_code=200, json=lambda: {'body': 20})
+        self.user_cache.set(self.generate_user())
+        self.user_manager.update_points(7, 'increase')
+        assert self.user_cache.get(7) is None
@@ -72,7 +72,7 @@ class TestUserManager(RaoTest):
         response = self.user_manager.report("user.mail")
         assert response == 404
         
-    @patch('mib.rao.user_manager.requests.get')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
     def test_get_user_by_id(self, mock_get):
         user = self.generate_user(type='operator')
         user_data = {
@@ -97,7 +97,7 @@ class TestUserManager(RaoTest):
         response = self.user_manager.get_user_by_id(id)
         assert response is not None
 
-    @patch('mib.rao.user_manager.requests.get')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
     def test_get_user_by_id_error(self, mock):
         mock.side_effect = requests.exceptions.Timeout()
         mock.return_value = Mock(status_code=400, json=lambda : {'message': 0})
@@ -105,7 +105,7 @@ class TestUserManager(RaoTest):
             self.user_manager.get_user_by_id(randint(0, 999))
             self.assertEqual(http_error.exception.code, 500)
 
-    @patch('mib.rao.user_manager.requests.get')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
     def test_get_user_by_email(self, mock_get):
         user = self.generate_user(type='customer')
         user_data = {
@@ -131,7 +131,7 @@ class TestUserManager(RaoTest):
         response = self.user_manager.get_user_by_email(user.email)
         assert response is not None
     
-    @patch('mib.rao.user_manager.requests.get')
+    @patch('mib.rao.user_manager.UserManager.backend.get')
     def test_get_user_by_email_error(self, mock):
         mock.side_effect = requests.exceptions.Timeout()
         mock.return_value = Mock(status_code=400, json=lambda : {'message': 0})
@@ -140,7 +140,7 @@ class TestUserManager(RaoTest):
             self.user_manager.get_user_by_email(email)
             self.assertEqual(http_error.exception.code, 500)
 
-    @patch('mib.rao.user_manager.requests.delete')
+    @patch('mib.rao.user_manager.UserManager.backend.delete')
     def test_delete_user(self, mock_get):
         user = self.generate_user(type='operator')
         mock_get.return_value = Mock(status_code=200)        
@@ -149,7 +149,7 @@ class TestUserManager(RaoTest):
             response = self.user_manager.delete_user(user_id=user.id)            
             assert response is not None
 
-    @patch('mib.rao.user_manager.requests.delete')
+    @patch('mib.rao.user_manager.UserManager.backend.delete')
     def test_delete_user_error(self, mock):
         mock.side_effect = requests.exceptions.Timeout()
         mock.return_value = Mock(status_code=400, json=lambda : {'message': 0})
@@ -158,7 +158,7 @@ class TestUserManager(RaoTest):
                 self.user_manager.delete_user(user_id=randint(0,999))
                 self.assertEqual(http_error.exception.code, 500)
 
-    @patch('mib.rao.user_manager.requests.post')
+    @patch('mib.rao.user_manager.UserManager.backend.post')
     def test_authenticate_user(self, mock_post):        
         user = self.generate_user(type='operator')
         user_data = {
@@ -182,7 +182,7 @@ class TestUserManager(RaoTest):
         )
         assert response is not None
 
-    @patch('mib.rao.user_manager.requests.post')
+    @patch('mib.rao.user_manager.UserManager.backend.post')
     def test_authenticate_user_error(self, mock_post):
         mock_post.side_effect = requests.exceptions.Timeout()
         mock_post.return_value = Mock(status_code=400, json=lambda : {'message': 0})
@@ -276,4 +276,37 @@ class TestUserManager(RaoTest):
     def test_exception_get_user_by_email(self):
         with pytest.raises(Exception) as exc:
             response = self.user_manager.get_user_by_email(233300303)
-    
\ No newline at end of file
+    
+    def user_json(self, user):
+        return {key: getattr(user, key) for key in User.SERIALIZE_LIST}
+
+    @patch('mib.rao.user_manager.UserManager.backend.post')
+    def test_get_users_by_emails(self, mock_post):
+        users = [self.generate_user('customer'), self.generate_user('customer')]
+        mock_post.return_value = Mock(
+            status_code=200,
+            json = lambda: {'body': [self.user_json(user) for user in users]}
+        )
+        self.user_manager.BATCH_LOOKUP_AVAILABLE = True
+        emails = [users[0].email, users[1].email, users[0].email]
+        response = self.user_manager.get_users_by_emails(emails)
+        assert mock_post.call_count == 1
+        assert mock_post.call_args[1]['json'] == {'emails': [users[0].email, users[1].email]}
+        assert set(response) == {users[0].email, users[1].email}
+
+    @patch('mib.rao.user_manager.UserManager.backend.get')
+    @patch('mib.rao.user_manager.UserManager.backend.post')
+    def test_get_users_by_emails_fallback(self, mock_post, mock_get):
+        user = self.generate_user('customer')
+        mock_post.return_value = Mock(status_code=404)
+        mock_get.side_effect = lambda url, **kwargs: Mock(
+            status_code=200, json = lambda: {'body': self.user_json(user)}
+        ) if url.endswith(user.email) else Mock(status_code=404)
+        self.user_manager.BATCH_LOOKUP_AVAILABLE = True
+        response = self.user_manager.get_users_by_emails([user.email, 'not@registered.it'])
+        assert list(response) == [user.email]
+        assert mock_get.call_count == 2
+        # the batch route is not requested anymore
+        self.user_manager.get_users_by_emails([user.email])
+        assert mock_post.call_count == 1
+        self.user_manager.BATCH_LOOKUP_AVAILABLE = True
@@ -0,0 +1,73 @@
+import unittest
+from base64 import b64encode
+
+
+class TestMedia(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from mib import create_app
+        cls.app = create_app()
+
+    def test_message_photo_response(self):
+        from mib.views.media import photo_response, photo_version
+        photo = b64encode(b'jpeg bytes').decode('utf-8')
+        with self.app.test_request_context('/media/message/1?v=%s' % photo_version(photo)):
+            response = photo_response(photo)
+        assert response.status_code == 200
+        assert response.data == b'jpeg bytes'
+        assert response.mimetype == 'image/jpeg'
+        assert response.get_etag()[0] == photo_version(photo)
+        assert response.cache_control.private
+        assert response.cache_control.max_age == self.app.config['MEDIA_CACHE_MAX_AGE']
+
+    def test_user_photo_response(self):
+        from mib.views.media import photo_response
+        from mib.auth.user import DEFAULT_PIC
+        with self.app.test_request_context('/media/user/1/photo'):
+            response = photo_response(DEFAULT_PIC)
+        assert response.mimetype == 'image/svg+xml'
+        assert response.data.startswith(b'<svg')
+        assert response.cache_control.private and not response.cache_control.public
+        # without the version in the url the photo is revalidated
+        assert response.cache_control.no_cache and response.cache_control.max_age is None
+
+    def test_profile_photo_url(self):
+        from unittest.mock import Mock, patch
+        from mib.views.users import profile_photo_url
+        with patch('mib.views.users.current_user', Mock(id=4)), \
+                patch('mib.rao.user_manager.UserManager.get_users_by_ids') as mock_lookup, \
+                self.app.test_request_context('/profile'):
+            assert profile_photo_url() == '/media/user/4/photo'
+        mock_lookup.assert_not_called()
+
+    def test_unknown_user_photo(self):
+        from unittest.mock import Mock, patch
+        from mib.views.media import user_photo
+        from werkzeug.exceptions import NotFound
+        with patch('mib.views.media.current_user', Mock(id=1)), \
+                patch('mib.rao.user_manager.UserCache.get_many', return_value={}), \
+                patch('mib.rao.user_manager.UserManager.backend.get',
+                      return_value=Mock(status_code=404, json=lambda: {'message': 'not found'})):
+            with self.app.test_request_context('/media/user/2/photo'):
+                with self.assertRaises(NotFound):
+                    user_photo.__wrapped__(2)
+
+    def test_not_modified(self):
+        from mib.views.media import photo_response, photo_version
+        photo = b64encode(b'jpeg bytes').decode('utf-8')
+        headers = {'If-None-Match': '"%s"' % photo_version(photo)}
+        with self.app.test_request_context('/media/message/1', headers=headers):
+            response = photo_response(photo)
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_photo_url(self):
+        from mib.views.media import message_photo_url, photo_version
+        from mib.rao.message import Message
+        message = Message()
+        message.id = 3
+        with self.app.test_request_context('/'):
+            assert message_photo_url(message) is None
+            message.photo = 'abcd'
+            assert message_photo_url(message) == '/media/message/3?v=%s' % photo_version('abcd')
@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import Mock, patch
+
+
+class TestSendMessage(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from mib import create_app
+        cls.app = create_app()
+
+    def generate_message(self, receiver):
+        from mib.rao.message import Message
+        return Message(id=-1, sender_id=1, receiver_id=-1, sender='a@a.it',
+                       receiver=receiver, body='Hello', photo='',
+                       timestamp='01/01/2030 10:00', draft=False, scheduled=True,
+                       sent=0, read=0, deleted=0, bold=False, italic=False,
+                       underline=False)
+
+    def send(self, receiver, created, failed, unknown):
+        from flask import get_flashed_messages
+        from mib.views.message import send_message
+        recipients = {email: Mock(id=id) for id, email in enumerate(receiver.split(', '))}
+        with self.app.test_request_context('/message/', method='POST'), \
+                patch('mib.rao.message_manager.MessageManager.create_messages',
+                      side_effect=lambda messages: (
+                          [m for m in messages if m.receiver in created],
+                          [m for m in messages if m.receiver in failed],
+                          [m for m in messages if m.receiver in unknown])):
+            sent = send_message(self.generate_message(receiver), recipients)
+            return sent, get_flashed_messages()
+
+    def test_sent_to_everyone(self):
+        sent, flashes = self.send('b@b.it, c@c.it', ['b@b.it', 'c@c.it'], [], [])
+        assert sent
+        assert flashes == []
+
+    def test_sent_to_some(self):
+        from mib.views.message import NOT_SENT_TO, SENT_TO, UNKNOWN_TO
+        sent, flashes = self.send('b@b.it, c@c.it, d@d.it', ['b@b.it'], ['c@c.it'], ['d@d.it'])
+        assert sent
+        assert flashes == [SENT_TO + 'b@b.it', NOT_SENT_TO + 'c@c.it', UNKNOWN_TO + 'd@d.it']
+
+    def test_sent_to_no_one(self):
+        sent, flashes = self.send('b@b.it, c@c.it', [], ['b@b.it', 'c@c.it'], [])
+        assert not sent
+        assert flashes == []
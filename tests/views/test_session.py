@@ -0,0 +1,139 @@
+import json
+import unittest
+from unittest.mock import Mock, patch
+from redis.exceptions import RedisError
+
+
+class TestSession(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from mib import create_app
+        cls.app = create_app()
+
+    def setUp(self):
+        from mockredis import MockRedis
+        self.redis = MockRedis(strict=True)
+        self.patcher = patch.object(self.app.session_interface, 'redis', self.redis)
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def generate_user(self):
+        from mib.auth.user import User
+        return User(id=1, email='mario@rossi.it', first_name='Mario', last_name='Rossi',
+                    birthdate='01/01/1990', photo='data:image/jpeg;base64,' + 'A' * 1000, points=10)
+
+    def test_session_in_redis(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+        cookie = next(cookie for cookie in client.cookie_jar
+                      if cookie.name == self.app.session_cookie_name)
+        key = self.app.config['SESSION_KEY_PREFIX'] + cookie.value
+        assert json.loads(self.redis.get(key))['_user_id'] == '1'
+        assert 0 < self.redis.ttl(key) <= self.app.config['SESSION_TTL_SECONDS']
+        with client.session_transaction() as session:
+            assert session['_user_id'] == '1'
+
+    def test_unmodified_session_not_written(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+        with patch.object(self.redis, 'setex') as mock_setex:
+            with client.session_transaction() as session:
+                assert session['_user_id'] == '1'
+        assert not mock_setex.called
+
+    def test_new_session_not_stored(self):
+        client = self.app.test_client()
+        with client.session_transaction():
+            pass
+        assert self.redis.keys('*') == []
+        assert not any(cookie.name == self.app.session_cookie_name for cookie in client.cookie_jar)
+
+    def test_redis_not_available(self):
+        redis = Mock()
+        redis.pipeline.side_effect = RedisError()
+        redis.setex.side_effect = RedisError()
+        with patch.object(self.app.session_interface, 'redis', redis):
+            client = self.app.test_client()
+            client.set_cookie('localhost', self.app.session_cookie_name, 'sid')
+            with client.session_transaction() as session:
+                assert '_user_id' not in session
+
+    def test_new_session_not_stored_is_error(self):
+        redis = Mock()
+        redis.setex.side_effect = RedisError()
+        with patch.object(self.app.session_interface, 'redis', redis):
+            client = self.app.test_client()
+            with self.assertRaises(RedisError):
+                with client.session_transaction() as session:
+                    session['_user_id'] = '1'
+
+    def test_session_update_not_stored(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+        with patch.object(self.redis, 'setex', side_effect=RedisError()):
+            with client.session_transaction() as session:
+                session['_fresh'] = True
+        with client.session_transaction() as session:
+            assert session['_user_id'] == '1'
+
+    def session_id(self, client):
+        return next(cookie.value for cookie in client.cookie_jar
+                    if cookie.name == self.app.session_cookie_name)
+
+    def test_unknown_session_id_not_adopted(self):
+        client = self.app.test_client()
+        client.set_cookie('localhost', self.app.session_cookie_name, 'chosen')
+        with client.session_transaction() as session:
+            session['_user_id'] = '1'
+        assert self.session_id(client) != 'chosen'
+        assert self.redis.get(self.app.config['SESSION_KEY_PREFIX'] + 'chosen') is None
+
+    def test_session_regenerated(self):
+        from mib.auth.session import regenerate_session
+        prefix = self.app.config['SESSION_KEY_PREFIX']
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['next'] = '/mailbox'
+        old_sid = self.session_id(client)
+
+        @self.app.route('/test_regenerate')
+        def regenerate():
+            regenerate_session()
+            return ''
+        client.get('/test_regenerate')
+        new_sid = self.session_id(client)
+        assert new_sid != old_sid
+        assert self.redis.get(prefix + old_sid) is None
+        assert json.loads(self.redis.get(prefix + new_sid))['next'] == '/mailbox'
+
+    def test_user_snapshot(self):
+        from flask import session
+        from mib.auth.session import USER_SNAPSHOT_KEY, forget_user, load_user_snapshot, remember_user
+        with self.app.test_request_context('/'):
+            remember_user(self.generate_user())
+            user = load_user_snapshot('1', 60)
+            assert user.email == 'mario@rossi.it' and user.points == 10
+            # the photo is not kept in the session
+            assert user.photo is None
+            assert 'AAAA' not in json.dumps(session[USER_SNAPSHOT_KEY])
+            assert load_user_snapshot('2', 60) is None
+            assert load_user_snapshot('1', -1) is None
+            forget_user(2)
+            assert load_user_snapshot('1', 60) is not None
+            forget_user(1)
+            assert load_user_snapshot('1', 60) is None
+
+    def test_user_cache_invalidate_forgets_snapshot(self):
+        from mib.auth.session import load_user_snapshot, remember_user
+        from mib.rao.user_cache import UserCache
+        with patch('mib.rao.user_cache.redis_client', self.redis):
+            with self.app.test_request_context('/'):
+                remember_user(self.generate_user())
+                UserCache.invalidate(1)
+                assert load_user_snapshot('1', 60) is None
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock, patch
+
+
+class TestStreaming(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from mib import create_app
+        cls.app = create_app()
+
+    def users(self, events):
+        from mib.auth.user import User
+        events.append('users')
+        for id in range(3):
+            yield User(id=id, email='user%d@mail.it' % id, first_name='Mario', last_name='Rossi',
+                       birthdate='01/01/1990', photo='', points=0)
+
+    def test_shell_sent_before_the_list(self):
+        from mib.views.utils import stream_template
+        events = []
+        with self.app.test_request_context('/users'):
+            response = stream_template('users.html', users=self.users(events), current_user=None)
+            assert response.is_streamed
+            for chunk in response.response:
+                events.append(chunk)
+        assert events[1] == 'users'
+        assert 'id="results"' in events[0]
+        assert 'user2@mail.it' in ''.join(events[2:])
+
+    def test_error_while_streaming(self):
+        from mib.views.utils import STREAM_ERROR, stream_template
+
+        def users():
+            yield from self.users([])
+            raise ValueError('truncated body')
+        with self.app.test_request_context('/users'):
+            response = stream_template('users.html', users=users(), current_user=None)
+            page = ''.join(response.response)
+        assert response.status_code == 200
+        assert 'user2@mail.it' in page
+        assert page.endswith(STREAM_ERROR)
+
+    def test_folder_errors_before_streaming(self):
+        import requests
+        from werkzeug.exceptions import InternalServerError
+        from mib.views.mailbox import get_folder
+        with patch('mib.views.mailbox.current_user', Mock(id=1, email='a@a.it')), \
+                self.app.test_request_context('/mailbox/inbox/'):
+            with patch('mib.rao.message_manager.MessageManager.backend.get',
+                       return_value=Mock(status_code=500)):
+                with self.assertRaises(RuntimeError):
+                    get_folder('inbox', None)
+            with patch('mib.rao.message_manager.MessageManager.backend.get',
+                       side_effect=requests.exceptions.Timeout()):
+                with self.assertRaises(InternalServerError):
+                    get_folder('inbox', 1)
+
+    def test_flush_without_streaming(self):
+        from flask import render_template_string
+        with self.app.test_request_context('/'):
+            assert render_template_string('a{{ flush() }}b') == 'ab'
+
+    def test_acknowledge_the_whole_folder(self):
+        from mib.rao.message import Message
+        from mib.views.mailbox import acknowledge_folder
+
+        def message(id, read, sent):
+            message = Message()
+            message.id, message.read, message.sent = id, read, sent
+            return message
+        page = [message(1, 1, 1), message(2, 0, 1)]
+        folder = page + [message(3, 1, 1), message(4, 1, 2)]
+        with patch('mib.views.mailbox.current_user', Mock(id=1, email='a@a.it')), \
+                patch('mib.views.mailbox.MessageManager') as manager, \
+                self.app.test_request_context('/mailbox/sent/?page=1'):
+            manager.get_notifications_number.return_value = {'inbox': 0, 'sent': 2}
+            manager.iter_dir.return_value = iter(folder)
+            assert acknowledge_folder(page) == [1]
+            # the receipt out of the page is acknowledged with the same request
+            manager.acknowledge_read_receipts.assert_called_once()
+            assert sorted(manager.acknowledge_read_receipts.call_args[0][0]) == [1, 3]
+            assert page[0].sent == 2 and page[1].sent == 1
+
+            # without notifications the folder is not read
+            manager.reset_mock()
+            manager.get_notifications_number.return_value = {'inbox': 0, 'sent': 0}
+            assert acknowledge_folder([message(5, 0, 1)]) == []
+            manager.iter_dir.assert_not_called()